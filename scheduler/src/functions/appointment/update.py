@@ -2,6 +2,8 @@ import json
 import logging
 from datetime import datetime, date, time
 
+from psycopg2.errors import ExclusionViolation
+
 from src.utils.http import parse_body, http_response, require_api_key, extract_path_param
 from src.services.db.postgres import PostgresService
 from src.services.appointment_service import AppointmentService, NotFoundError, OptimisticLockError, ConflictError
@@ -142,7 +144,11 @@ def handler(event, context):
                 WHERE id = %s::uuid
                 RETURNING *
             """
-            db.execute_write_returning(query, tuple(params))
+            try:
+                db.execute_write_returning(query, tuple(params))
+            except ExclusionViolation:
+                # e.g. re-confirming a cancelled appointment whose slot was taken meanwhile
+                raise ConflictError("Conflito de horário: já existe agendamento confirmado neste horário")
             changed = True
 
         if not changed:
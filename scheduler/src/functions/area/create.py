@@ -60,7 +60,7 @@ def handler(event, context):
         # 4. Verificar se a clinica existe
         db = PostgresService()
 
-        clinic_check = db.execute_query(
+        clinic_check = db.execute_scalar(
             "SELECT 1 FROM scheduler.clinics WHERE clinic_id = %s",
             (clinic_id,)
         )
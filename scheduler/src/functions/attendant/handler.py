@@ -6,17 +6,22 @@ import time
 import boto3
 
 from src.utils.http import parse_body, http_response, require_api_key, extract_query_param
-from src.services.conversation_engine import ConversationState
+from src.services.conversation_engine import ConversationState, SESSION_TTL_SECONDS
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 ATTENDANT_TTL_SECONDS = 24 * 60 * 60
 
+# Reused across warm invocations of the same Lambda container
+_sessions_table = None
+
 
 def _get_sessions_table():
-    dynamodb = boto3.resource("dynamodb")
-    return dynamodb.Table(os.environ["CONVERSATION_SESSIONS_TABLE"])
+    global _sessions_table
+    if _sessions_table is None:
+        _sessions_table = boto3.resource("dynamodb").Table(os.environ["CONVERSATION_SESSIONS_TABLE"])
+    return _sessions_table
 
 
 def _load_session(table, clinic_id, phone):
@@ -42,6 +47,7 @@ def _save_session(table, clinic_id, phone, item):
                 "clinicId": clinic_id,
                 "phone": phone,
                 "updatedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now)),
+                "ttl": now + SESSION_TTL_SECONDS,
             }
         )
     except Exception as e:
@@ -63,14 +69,10 @@ def handler(event, context):
     if auth_error:
         return auth_error
 
-    if method == "GET" and path.endswith("/status"):
-        return _handle_status(event)
-    elif method == "POST" and path.endswith("/activate"):
-        return _handle_activate(event)
-    elif method == "POST" and path.endswith("/deactivate"):
-        return _handle_deactivate(event)
-    else:
+    route = _ROUTES.get((method, path.rsplit("/", 1)[-1]))
+    if route is None:
         return http_response(404, {"status": "ERROR", "message": "Rota nao encontrada"})
+    return route(event)
 
 
 def _handle_activate(event):
@@ -168,3 +170,10 @@ def _handle_status(event):
 
 def _normalize_phone(phone):
     return "".join(c for c in phone if c.isdigit())
+
+
+_ROUTES = {
+    ("GET", "status"): _handle_status,
+    ("POST", "activate"): _handle_activate,
+    ("POST", "deactivate"): _handle_deactivate,
+}
@@ -59,7 +59,7 @@ def handler(event, context):
 
         db = PostgresService()
 
-        clinic_check = db.execute_query(
+        clinic_check = db.execute_scalar(
             "SELECT 1 FROM scheduler.clinics WHERE clinic_id = %s",
             (clinic_id,)
         )
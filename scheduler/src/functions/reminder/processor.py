@@ -1,5 +1,6 @@
 import uuid
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 from src.services.db.postgres import PostgresService
@@ -11,6 +12,9 @@ from src.providers.whatsapp_provider import get_provider
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# z-api sends are pure network wait; overlap them (the provider session pools 10 connections)
+SEND_MAX_WORKERS = 8
+
 
 def handler(event, context):
     """
@@ -35,6 +39,8 @@ def handler(event, context):
     # Cache clinics to avoid repeated DB lookups
     clinic_cache = {}
 
+    # 1. Prepare every reminder sequentially (DB and DynamoDB access stay on this thread)
+    outgoing = []
     for reminder in reminders:
         reminder_id = reminder.get("reminderId", "")
         clinic_id = reminder.get("clinicId", "")
@@ -68,7 +74,6 @@ def handler(event, context):
                 {"time": appointment_time, "clinic_name": clinic_name, "patient_name": patient_name},
             )
 
-            # Send via provider
             provider = get_provider(clinic)
             msg_id = str(uuid.uuid4())
             conversation_id = f"{clinic_id}#{phone}"
@@ -84,8 +89,29 @@ def handler(event, context):
                 metadata={"reminderType": "REMINDER_24H", "reminderId": reminder_id},
             )
 
-            response = provider.send_text(phone, content)
+            outgoing.append({
+                "reminder_id": reminder_id, "clinic_id": clinic_id, "phone": phone, "pk": pk, "sk": sk,
+                "msg_id": msg_id, "conversation_id": conversation_id, "content": content, "provider": provider,
+            })
 
+        except Exception as e:
+            logger.error(f"[traceId: {trace_id}] Erro ao processar lembrete {reminder_id}: {e}")
+            reminder_service.mark_failed(reminder_id, pk, sk, str(e))
+            failed += 1
+
+    # 2. Send via provider concurrently (send failures come back as success=False, not raised)
+    if outgoing:
+        with ThreadPoolExecutor(max_workers=min(SEND_MAX_WORKERS, len(outgoing))) as executor:
+            responses = list(executor.map(lambda item: item["provider"].send_text(item["phone"], item["content"]), outgoing))
+    else:
+        responses = []
+
+    # 3. Record outcomes sequentially
+    for item, response in zip(outgoing, responses):
+        reminder_id, clinic_id, phone = item["reminder_id"], item["clinic_id"], item["phone"]
+        pk, sk, msg_id = item["pk"], item["sk"], item["msg_id"]
+        conversation_id, content = item["conversation_id"], item["content"]
+        try:
             if response.success:
                 tracker.track_outbound(
                     clinic_id=clinic_id,
@@ -142,7 +142,7 @@ def handler(event, context):
 
             # Update last_message_at on patient record (skip soft-deleted)
             try:
-                db.execute_query(
+                db.execute_write(
                     """UPDATE scheduler.patients
                        SET last_message_at = NOW(), updated_at = NOW()
                        WHERE clinic_id = %s AND phone = %s AND deleted_at IS NULL""",
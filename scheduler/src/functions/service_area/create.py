@@ -64,7 +64,7 @@ def handler(event, context):
         db = PostgresService()
 
         # Verify service exists
-        svc_check = db.execute_query(
+        svc_check = db.execute_scalar(
             "SELECT 1 FROM scheduler.services WHERE id = %s::uuid",
             (service_id,)
         )
@@ -120,7 +120,7 @@ def handler(event, context):
 
         for area_id in area_ids:
             # Verify area exists
-            area_check = db.execute_query(
+            area_check = db.execute_scalar(
                 "SELECT 1 FROM scheduler.areas WHERE id = %s::uuid AND active = TRUE",
                 (area_id,)
             )
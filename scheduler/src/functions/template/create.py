@@ -1,6 +1,4 @@
-import json
 import logging
-from datetime import datetime, date, time
 
 from psycopg2.extras import Json
 
@@ -11,16 +9,6 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
-def _serialize_row(row):
-    result = {}
-    for key, value in row.items():
-        if isinstance(value, (datetime, date, time)):
-            result[key] = value.isoformat()
-        else:
-            result[key] = value
-    return result
-
-
 def handler(event, context):
     """
     Handler para criacao de template de mensagem via API.
@@ -34,7 +22,10 @@ def handler(event, context):
     }
     """
     try:
-        logger.info(f"Requisicao recebida para criacao de template: {json.dumps(event)}")
+        logger.info(
+            "Requisicao recebida para criacao de template: %s %s",
+            event.get("httpMethod"), event.get("path"),
+        )
 
         # 1. Validar API key
         api_key, error_response = require_api_key(event)
@@ -97,15 +88,13 @@ def handler(event, context):
                 "message": "Erro ao criar template"
             })
 
-        template = _serialize_row(result)
-
         logger.info(f"[clinicId: {clinic_id}] Template criado com sucesso: {template_key}")
 
         # 5. Retornar resposta
         return http_response(201, {
             "status": "SUCCESS",
             "message": "Template criado com sucesso",
-            "data": template
+            "data": result
         })
 
     except Exception as e:
@@ -1,6 +1,4 @@
-import json
 import logging
-from datetime import datetime, date, time
 
 from src.utils.http import http_response, require_api_key, extract_path_param, extract_query_param
 from src.services.db.postgres import PostgresService
@@ -8,15 +6,8 @@ from src.services.db.postgres import PostgresService
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-
-def _serialize_row(row):
-    result = {}
-    for key, value in row.items():
-        if isinstance(value, (datetime, date, time)):
-            result[key] = value.isoformat()
-        else:
-            result[key] = value
-    return result
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
 
 
 def handler(event, context):
@@ -26,9 +17,17 @@ def handler(event, context):
     GET /clinics/{clinicId}/templates
     Query params opcionais:
         - template_key: filtra por template_key especifica
+        - limit: maximo de templates retornados (padrao 100, maximo 500)
+        - offset: deslocamento para paginacao (padrao 0)
+
+    Sem limit, apenas os primeiros 100 templates sao retornados (antes a
+    listagem trazia todos).
     """
     try:
-        logger.info(f"Requisicao recebida para listagem de templates: {json.dumps(event)}")
+        logger.info(
+            "Requisicao recebida para listagem de templates: %s %s",
+            event.get("httpMethod"), event.get("path"),
+        )
 
         # 1. Validar API key
         api_key, error_response = require_api_key(event)
@@ -43,37 +42,49 @@ def handler(event, context):
                 "message": "clinicId não fornecido no path"
             })
 
-        # 3. Verificar filtro opcional por template_key
+        # 3. Verificar filtro opcional por template_key e paginacao
         template_key = extract_query_param(event, "template_key")
+        try:
+            limit = int(extract_query_param(event, "limit") or DEFAULT_LIMIT)
+            offset = int(extract_query_param(event, "offset") or "0")
+        except ValueError:
+            return http_response(400, {
+                "status": "ERROR",
+                "message": "limit e offset devem ser inteiros"
+            })
+        if limit < 0 or offset < 0:
+            return http_response(400, {
+                "status": "ERROR",
+                "message": "limit e offset não podem ser negativos"
+            })
+        limit = min(limit, MAX_LIMIT)
 
         db = PostgresService()
 
+        # O Postgres monta o array JSON; a lista chega pronta para o body
+        filters = "clinic_id = %s AND active = true"
+        params = [clinic_id]
         if template_key:
-            query = """
-                SELECT * FROM scheduler.message_templates
-                WHERE clinic_id = %s AND template_key = %s AND active = true
-                ORDER BY template_key
-            """
-            params = (clinic_id, template_key)
-        else:
-            query = """
-                SELECT * FROM scheduler.message_templates
-                WHERE clinic_id = %s AND active = true
+            filters += " AND template_key = %s"
+            params.append(template_key)
+
+        data = db.execute_scalar(f"""
+            SELECT COALESCE(jsonb_agg(to_jsonb(m) ORDER BY m.template_key), '[]'::jsonb)::text
+            FROM (
+                SELECT id, clinic_id, template_key, content, buttons, active, created_at, updated_at
+                FROM scheduler.message_templates
+                WHERE {filters}
                 ORDER BY template_key
-            """
-            params = (clinic_id,)
+                LIMIT %s OFFSET %s
+            ) m
+        """, tuple(params + [limit, offset]))
 
-        rows = db.execute_query(query, params)
-
-        templates = [_serialize_row(row) for row in rows]
-
-        logger.info(f"[clinicId: {clinic_id}] Listagem concluida: {len(templates)} template(s) encontrado(s)")
+        logger.info(f"[clinicId: {clinic_id}] Listagem concluida (limit={limit}, offset={offset})")
 
         # 4. Retornar resposta
-        return http_response(200, {
-            "status": "SUCCESS",
-            "data": templates
-        })
+        response = http_response(200, {"status": "SUCCESS"})
+        response["body"] = '{"status":"SUCCESS","data":' + data + '}'
+        return response
 
     except Exception as e:
         error_msg = str(e)
@@ -1,6 +1,4 @@
-import json
 import logging
-from datetime import datetime, date, time
 
 from psycopg2.extras import Json
 
@@ -10,18 +8,16 @@ from src.services.db.postgres import PostgresService
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-ALLOWED_FIELDS = {"content", "buttons", "active"}
-JSONB_FIELDS = {"buttons"}
-
-
-def _serialize_row(row):
-    result = {}
-    for key, value in row.items():
-        if isinstance(value, (datetime, date, time)):
-            result[key] = value.isoformat()
-        else:
-            result[key] = value
-    return result
+# Texto fixo independente dos campos enviados, para o Postgres reaproveitar o plano
+UPDATE_TEMPLATE_QUERY = """
+    UPDATE scheduler.message_templates
+    SET content = COALESCE(%s, content),
+        buttons = COALESCE(%s::jsonb, buttons),
+        active = COALESCE(%s::boolean, active),
+        updated_at = NOW()
+    WHERE id = %s::uuid
+    RETURNING *
+"""
 
 
 def handler(event, context):
@@ -37,7 +33,10 @@ def handler(event, context):
     }
     """
     try:
-        logger.info(f"Requisicao recebida para atualizacao de template: {json.dumps(event)}")
+        logger.info(
+            "Requisicao recebida para atualizacao de template: %s %s",
+            event.get("httpMethod"), event.get("path"),
+        )
 
         # 1. Validar API key
         api_key, error_response = require_api_key(event)
@@ -61,41 +60,28 @@ def handler(event, context):
 
         logger.info(f"Atualizando template: {template_id}")
 
-        # 3. Construir query dinamica apenas com campos fornecidos
-        set_clauses = []
-        params = []
-
-        for field in ALLOWED_FIELDS:
-            if field in body:
-                value = body[field]
-                if field in JSONB_FIELDS:
-                    value = Json(value)
-                set_clauses.append(f"{field} = %s")
-                params.append(value)
+        # 3. Campos ausentes ou null mantem o valor atual (COALESCE)
+        content = body.get("content")
+        buttons = body.get("buttons")
+        active = body.get("active")
 
-        if not set_clauses:
+        if content is None and buttons is None and active is None:
             return http_response(400, {
                 "status": "ERROR",
                 "message": "Nenhum campo válido fornecido para atualização"
             })
 
-        # Sempre atualizar updated_at
-        set_clauses.append("updated_at = NOW()")
-
-        # Adicionar templateId no final dos params para o WHERE
-        params.append(template_id)
-
-        query = f"""
-            UPDATE scheduler.message_templates
-            SET {', '.join(set_clauses)}
-            WHERE id = %s::uuid
-            RETURNING *
-        """
+        params = (
+            content,
+            Json(buttons) if buttons is not None else None,
+            active,
+            template_id,
+        )
 
         # 4. Executar atualizacao
         db = PostgresService()
 
-        result = db.execute_write_returning(query, tuple(params))
+        result = db.execute_write_returning(UPDATE_TEMPLATE_QUERY, params)
 
         if not result:
             return http_response(404, {
@@ -103,15 +89,13 @@ def handler(event, context):
                 "message": f"Template não encontrado: {template_id}"
             })
 
-        template = _serialize_row(result)
-
         logger.info(f"Template atualizado com sucesso: {template_id}")
 
         # 5. Retornar resposta
         return http_response(200, {
             "status": "SUCCESS",
             "message": "Template atualizado com sucesso",
-            "data": template
+            "data": result
         })
 
     except Exception as e:
@@ -1,8 +1,8 @@
-import json
 import os
 import time
-import uuid
+import secrets
 import logging
+from collections import OrderedDict
 
 import boto3
 
@@ -10,14 +10,31 @@ from src.utils.http import parse_body, http_response
 from src.utils.phone import normalize_phone
 from src.services.db.postgres import PostgresService
 from src.services.template_service import TemplateService
-from src.services.conversation_engine import ConversationEngine, ConversationState
+from src.services.availability_engine import AvailabilityEngine
+from src.services.appointment_service import AppointmentService
+from src.services.intent_classifier import IntentClassifier
+from src.services.openai_service import OpenAIService
+from src.services.conversation_engine import ConversationEngine, ConversationState, SESSION_TTL_SECONDS
 from src.services.message_tracker import MessageTracker
 from src.services.lead_service import LeadService, extract_gclid
-from src.providers.whatsapp_provider import get_provider
+from src.providers.whatsapp_provider import get_provider, is_phone_allowed
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# z-api callbacks carry media as URLs, so legitimate payloads stay far below this
+MAX_WEBHOOK_BODY_BYTES = 64 * 1024
+CLINIC_CACHE_TTL_SECONDS = 60
+
+# Reused across warm invocations of the same Lambda container
+_db = None
+_clinic_cache = {}
+_sessions_table = None
+_availability_engine = None
+_appointment_service = None
+_intent_classifier = None
+_intent_classifier_loaded = False
+
 
 def handler(event, context):
     """
@@ -28,11 +45,19 @@ def handler(event, context):
     No API key required — authentication via instanceId validation.
     """
     try:
+        raw_body = event.get("body")
+        if isinstance(raw_body, str) and len(raw_body) > MAX_WEBHOOK_BODY_BYTES:
+            logger.warning("[Webhook] Payload ignorado: %d bytes excede o limite", len(raw_body))
+            return http_response(200, {"status": "OK"})
+
         body = parse_body(event)
         if not body:
             return http_response(200, {"status": "OK"})
 
-        logger.info(f"[Webhook] Payload recebido: {json.dumps(body)[:500]}")
+        logger.info(
+            "[Webhook] Payload recebido: instanceId=%s messageId=%s fromMe=%s keys=%s",
+            body.get("instanceId"), body.get("messageId"), body.get("fromMe"), list(body.keys()),
+        )
 
         # 1. Validate callback type
         if body.get("isGroup", False):
@@ -61,9 +86,8 @@ def handler(event, context):
         # 1b. Handle fromMe (attendant messages or bot echo)
         if body.get("fromMe", False):
             logger.info(
-                f"[Webhook] fromMe=true | status={body.get('status')} | type={body.get('type')} | "
-                f"phone={body.get('phone')} | messageId={body.get('messageId')} | "
-                f"payload_keys={list(body.keys())}"
+                "[Webhook] fromMe=true | status=%s | type=%s | phone=%s | messageId=%s",
+                body.get("status"), body.get("type"), body.get("phone"), body.get("messageId"),
             )
             # Messages sent via API/bot arrive with status=SENT; ignore them
             if body.get("status") == "SENT":
@@ -74,8 +98,7 @@ def handler(event, context):
             phone = body.get("phone", "")
             if phone and instance_id:
                 content = _extract_text_content(body)
-                db = PostgresService()
-                clinic_id = _resolve_clinic_id(db, instance_id)
+                clinic_id = _resolve_clinic_id(_get_db(), instance_id)
                 if clinic_id:
                     DEACTIVATION_COMMANDS = {
                         "#encerrar", "#fim",
@@ -91,7 +114,7 @@ def handler(event, context):
                     if content:
                         try:
                             tracker = MessageTracker()
-                            msg_id = body.get("messageId") or body.get("id", {}).get("id", "") or str(uuid.uuid4())
+                            msg_id = body.get("messageId") or body.get("id", {}).get("id", "") or secrets.token_hex(16)
                             conversation_id = f"{clinic_id}#{phone}"
                             tracker.track_outbound(
                                 clinic_id=clinic_id,
@@ -108,17 +131,25 @@ def handler(event, context):
             logger.info("[Webhook] Mensagem propria processada (fromMe=true)")
             return http_response(200, {"status": "OK"})
 
-        db = PostgresService()
-        clinics = db.execute_query(
-            "SELECT * FROM scheduler.clinics WHERE zapi_instance_id = %s AND active = TRUE",
-            (instance_id,),
-        )
+        # 1c. Allowlist: the bot never answers these phones, so skip all work
+        if not is_phone_allowed(raw_phone):
+            masked = raw_phone[-4:] if len(raw_phone) >= 4 else raw_phone
+            logger.info(f"[Webhook] Ignorando telefone fora da allowlist: ***{masked}")
+            return http_response(200, {"status": "OK"})
+
+        # 1d. Dedup before any Postgres work: z-api can deliver the same callback more than once
+        message_id = body.get("messageId", "")
+        if message_id and _is_duplicate_message(instance_id, message_id):
+            logger.info(f"[Webhook] Duplicate message {message_id}, skipping")
+            return http_response(200, {"status": "OK", "duplicate": True})
+
+        db = _get_db()
+        clinic = _get_clinic(db, instance_id)
 
-        if not clinics:
+        if not clinic:
             logger.warning(f"[Webhook] Clinica não encontrada para instanceId={instance_id}")
             return http_response(200, {"status": "OK"})
 
-        clinic = clinics[0]
         clinic_id = clinic["clinic_id"]
 
         # Global bot pause — clinic owner disabled the bot
@@ -131,7 +162,6 @@ def handler(event, context):
         tracker = MessageTracker()
         template_service = TemplateService(db)
 
-        # availability_engine and appointment_service are optional (Phase 8)
         availability_engine = _get_availability_engine(db)
         appointment_service = _get_appointment_service(db)
 
@@ -147,6 +177,7 @@ def handler(event, context):
                 appointment_service=appointment_service,
                 provider=provider,
                 message_tracker=tracker,
+                sessions_table=_get_sessions_table(),
             )
         else:
             intent_classifier = _get_intent_classifier()
@@ -158,13 +189,14 @@ def handler(event, context):
                 provider=provider,
                 message_tracker=tracker,
                 intent_classifier=intent_classifier,
+                sessions_table=_get_sessions_table(),
             )
 
         # 4. Parse incoming message
         incoming = provider.parse_incoming_message(body)
         logger.info(
-            f"[Webhook] Mensagem de {incoming.phone} | type={incoming.message_type} | "
-            f"content='{incoming.content[:50]}' | clinic={clinic_id}"
+            "[Webhook] Mensagem de %s | type=%s | content='%.50s' | clinic=%s",
+            incoming.phone, incoming.message_type, incoming.content, clinic_id,
         )
 
         # 4a. Drop messages with no processable content (empty text, unsupported
@@ -193,23 +225,8 @@ def handler(event, context):
             except Exception as e:
                 logger.error(f"[Webhook] Erro ao salvar lead: {e}")
 
-        # 5. Dedup: skip if this message_id was already processed (z-api can send duplicate webhooks)
+        # 5. Track inbound
         conversation_id = f"{clinic_id}#{incoming.phone}"
-        dedup_table = boto3.resource("dynamodb").Table(os.environ.get("CONVERSATION_SESSIONS_TABLE", ""))
-        try:
-            dedup_table.put_item(
-                Item={
-                    "pk": f"DEDUP#{clinic_id}",
-                    "sk": f"MSG#{incoming.message_id}",
-                    "ttl": int(time.time()) + 300,  # 5 min TTL
-                },
-                ConditionExpression="attribute_not_exists(pk)",
-            )
-        except dedup_table.meta.client.exceptions.ConditionalCheckFailedException:
-            logger.info(f"[Webhook] Duplicate message {incoming.message_id}, skipping")
-            return http_response(200, {"status": "OK", "duplicate": True})
-
-        # 5b. Track inbound
         tracker.track_inbound(
             clinic_id=clinic_id,
             phone=incoming.phone,
@@ -221,30 +238,15 @@ def handler(event, context):
         # 6. Process through conversation engine
         outgoing_messages = engine.process_message(clinic_id, incoming)
 
-        # 7. Send responses
+        # 7. Send responses in order (same chat), then write every outbound
+        # event in one BatchWriteItem. Only the final SENT/FAILED status is
+        # recorded: a QUEUED item flushed alongside it would be overwritten anyway.
         for msg in outgoing_messages:
-            msg_id = str(uuid.uuid4())
-
-            tracker.track_outbound(
-                clinic_id=clinic_id,
-                phone=incoming.phone,
-                message_id=msg_id,
-                conversation_id=conversation_id,
-                message_type=msg.message_type.upper(),
-                content=msg.content,
-                status="QUEUED",
-            )
-
-            if msg.message_type == "buttons" and msg.buttons:
-                response = provider.send_buttons(incoming.phone, msg.content, msg.buttons)
-            elif msg.message_type == "list" and msg.sections:
-                button_text = msg.button_text or "Selecione"
-                response = provider.send_list(incoming.phone, msg.content, button_text, msg.sections)
-            else:
-                response = provider.send_text(incoming.phone, msg.content)
+            msg_id = secrets.token_hex(16)
+            response = _send_outgoing(provider, incoming.phone, msg)
 
             if response.success:
-                tracker.track_outbound(
+                tracker.track_outbound_deferred(
                     clinic_id=clinic_id,
                     phone=incoming.phone,
                     message_id=msg_id,
@@ -257,7 +259,7 @@ def handler(event, context):
                 )
                 logger.info(f"[Webhook] Resposta enviada: msgId={msg_id} providerMsgId={response.provider_message_id}")
             else:
-                tracker.track_outbound(
+                tracker.track_outbound_deferred(
                     clinic_id=clinic_id,
                     phone=incoming.phone,
                     message_id=msg_id,
@@ -269,6 +271,8 @@ def handler(event, context):
                 )
                 logger.error(f"[Webhook] Falha ao enviar resposta: msgId={msg_id} error={response.error}")
 
+        tracker.flush()
+
         return http_response(200, {"status": "OK", "messagesProcessed": len(outgoing_messages)})
 
     except Exception as e:
@@ -277,65 +281,117 @@ def handler(event, context):
         return http_response(200, {"status": "OK", "error": "internal"})
 
 
+def _send_outgoing(provider, phone: str, msg):
+    if msg.message_type == "buttons" and msg.buttons:
+        return provider.send_buttons(phone, msg.content, msg.buttons)
+    if msg.message_type == "list" and msg.sections:
+        return provider.send_list(phone, msg.content, msg.button_text or "Selecione", msg.sections)
+    return provider.send_text(phone, msg.content)
+
+
 def _get_intent_classifier():
-    try:
-        if not os.environ.get("OPENAI_API_KEY"):
+    global _intent_classifier, _intent_classifier_loaded
+    if not _intent_classifier_loaded:
+        if os.environ.get("OPENAI_API_KEY"):
+            _intent_classifier = IntentClassifier(OpenAIService())
+        else:
             logger.info("[Webhook] IntentClassifier disabled (no OPENAI_API_KEY)")
-            return None
-        from src.services.intent_classifier import IntentClassifier
-        from src.services.openai_service import OpenAIService
-        return IntentClassifier(OpenAIService())
-    except ImportError:
-        logger.info("[Webhook] IntentClassifier not available")
-        return None
+        _intent_classifier_loaded = True
+    return _intent_classifier
 
 
 def _get_availability_engine(db):
-    try:
-        from src.services.availability_engine import AvailabilityEngine
-        return AvailabilityEngine(db)
-    except ImportError:
-        logger.info("[Webhook] AvailabilityEngine nao disponivel (Phase 8)")
-        return None
+    global _availability_engine
+    if _availability_engine is None:
+        _availability_engine = AvailabilityEngine(db)
+    return _availability_engine
 
 
 def _get_appointment_service(db):
-    try:
-        from src.services.appointment_service import AppointmentService
-        lead_service = LeadService(db)
-        return AppointmentService(db, lead_service=lead_service)
-    except ImportError:
-        logger.info("[Webhook] AppointmentService nao disponivel (Phase 8)")
-        return None
+    global _appointment_service
+    if _appointment_service is None:
+        _appointment_service = AppointmentService(db, lead_service=LeadService(db))
+    return _appointment_service
 
 
 ATTENDANT_TTL_SECONDS = 24 * 60 * 60  # 24 hours
+DEDUP_TTL_SECONDS = 300
+LOCAL_DEDUP_MAX_ENTRIES = 10000
+
+# z-api retries usually land on the same warm container; this catches them
+# without a DynamoDB round-trip. Cross-container duplicates fall through to DynamoDB.
+_seen_messages = OrderedDict()
+
+
+def _is_duplicate_message(instance_id: str, message_id: str) -> bool:
+    """Marks the message as seen; returns True if it had already been marked."""
+    key = (instance_id, message_id)
+    now = time.monotonic()
+    seen_at = _seen_messages.get(key)
+    if seen_at is not None and now - seen_at < DEDUP_TTL_SECONDS:
+        return True
+    _seen_messages[key] = now
+    _seen_messages.move_to_end(key)
+    if len(_seen_messages) > LOCAL_DEDUP_MAX_ENTRIES:
+        _seen_messages.popitem(last=False)
+
+    dedup_table = _get_sessions_table()
+    try:
+        dedup_table.put_item(
+            Item={
+                "pk": f"DEDUP#{instance_id}",
+                "sk": f"MSG#{message_id}",
+                "ttl": int(time.time()) + DEDUP_TTL_SECONDS,
+            },
+            ConditionExpression="attribute_not_exists(pk)",
+        )
+    except dedup_table.meta.client.exceptions.ConditionalCheckFailedException:
+        return True
+    except Exception as e:
+        # Fail open: losing dedup is better than dropping a patient message
+        logger.error(f"[Webhook] Erro no dedup de mensagem: {e}")
+    return False
 
 
-def _resolve_clinic_id(db: PostgresService, instance_id: str):
+def _get_db() -> PostgresService:
+    global _db
+    if _db is None:
+        _db = PostgresService()
+    return _db
+
+
+def _get_clinic(db: PostgresService, instance_id: str):
+    """Active clinic for a z-api instance, cached per container for CLINIC_CACHE_TTL_SECONDS."""
+    now = time.monotonic()
+    cached = _clinic_cache.get(instance_id)
+    if cached and cached[0] > now:
+        return cached[1]
+
     clinics = db.execute_query(
-        "SELECT clinic_id FROM scheduler.clinics WHERE zapi_instance_id = %s AND active = TRUE",
+        """
+        SELECT clinic_id, zapi_instance_id, zapi_instance_token, use_agent, bot_paused
+        FROM scheduler.clinics
+        WHERE zapi_instance_id = %s AND active = TRUE
+        """,
         (instance_id,),
     )
-    return clinics[0]["clinic_id"] if clinics else None
+    if not clinics:
+        return None
 
+    _clinic_cache[instance_id] = (now + CLINIC_CACHE_TTL_SECONDS, clinics[0])
+    return clinics[0]
 
-def _get_sessions_table():
-    dynamodb = boto3.resource("dynamodb")
-    return dynamodb.Table(os.environ["CONVERSATION_SESSIONS_TABLE"])
 
+def _resolve_clinic_id(db: PostgresService, instance_id: str):
+    clinic = _get_clinic(db, instance_id)
+    return clinic["clinic_id"] if clinic else None
 
-def _load_session(table, clinic_id: str, phone: str) -> dict:
-    try:
-        response = table.get_item(
-            Key={"pk": f"CLINIC#{clinic_id}", "sk": f"PHONE#{phone}"}
-        )
-        item = response.get("Item")
-        if item:
-            return item.get("session", {})
-    except Exception as e:
-        logger.error(f"[Webhook] Error loading session: {e}")
-    return {}
+
+def _get_sessions_table():
+    global _sessions_table
+    if _sessions_table is None:
+        _sessions_table = boto3.resource("dynamodb").Table(os.environ["CONVERSATION_SESSIONS_TABLE"])
+    return _sessions_table
 
 
 def _save_session(table, clinic_id: str, phone: str, session: dict) -> None:
@@ -349,6 +405,7 @@ def _save_session(table, clinic_id: str, phone: str, session: dict) -> None:
                 "clinicId": clinic_id,
                 "phone": phone,
                 "updatedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now)),
+                "ttl": now + SESSION_TTL_SECONDS,
             }
         )
     except Exception as e:
@@ -362,24 +419,82 @@ def _extract_text_content(body: dict) -> str:
 
 
 
+def _session_key(clinic_id: str, phone: str) -> dict:
+    return {"pk": f"CLINIC#{clinic_id}", "sk": f"PHONE#{phone}"}
+
+
 def _activate_attendant_mode(clinic_id: str, phone: str) -> None:
     table = _get_sessions_table()
-    session = _load_session(table, clinic_id, phone)
-
-    session["_previous_state_before_attendant"] = session.get("state", "")
-    session["state"] = ConversationState.HUMAN_ATTENDANT_ACTIVE.value
-    session["attendant_active_until"] = int(time.time()) + ATTENDANT_TTL_SECONDS
-    _save_session(table, clinic_id, phone, session)
+    now = int(time.time())
+    active_until = now + ATTENDANT_TTL_SECONDS
+    try:
+        # Single round-trip: all operands read the item as it was before the update
+        table.update_item(
+            Key=_session_key(clinic_id, phone),
+            UpdateExpression=(
+                "SET #session.#previous = if_not_exists(#session.#state, :empty), "
+                "#session.#state = :active, #session.#until = :until, #updatedAt = :updatedAt, #ttl = :ttl"
+            ),
+            ConditionExpression="attribute_exists(#session)",
+            ExpressionAttributeNames={
+                "#session": "session",
+                "#state": "state",
+                "#previous": "_previous_state_before_attendant",
+                "#until": "attendant_active_until",
+                "#updatedAt": "updatedAt",
+                "#ttl": "ttl",
+            },
+            ExpressionAttributeValues={
+                ":empty": "",
+                ":active": ConversationState.HUMAN_ATTENDANT_ACTIVE.value,
+                ":until": active_until,
+                ":updatedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now)),
+                ":ttl": now + SESSION_TTL_SECONDS,
+            },
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        # No session yet for this phone: create it already in attendant mode
+        _save_session(table, clinic_id, phone, {
+            "_previous_state_before_attendant": "",
+            "state": ConversationState.HUMAN_ATTENDANT_ACTIVE.value,
+            "attendant_active_until": active_until,
+        })
+    except Exception as e:
+        logger.error(f"[Webhook] Error activating attendant mode: {e}")
+        return
     logger.info(f"[Webhook] Modo atendente ativado/renovado para {phone} (TTL 24h)")
 
 
 def _deactivate_attendant_mode(clinic_id: str, phone: str) -> None:
     table = _get_sessions_table()
-    session = _load_session(table, clinic_id, phone)
-
-    session["state"] = ConversationState.WELCOME.value
-    session.pop("attendant_active_until", None)
-    session.pop("human_handoff_requested_at", None)
-    session.pop("_previous_state_before_attendant", None)
-    _save_session(table, clinic_id, phone, session)
+    now = int(time.time())
+    try:
+        table.update_item(
+            Key=_session_key(clinic_id, phone),
+            UpdateExpression=(
+                "SET #session.#state = :welcome, #updatedAt = :updatedAt, #ttl = :ttl "
+                "REMOVE #session.#until, #session.#handoff, #session.#previous"
+            ),
+            ConditionExpression="attribute_exists(#session)",
+            ExpressionAttributeNames={
+                "#session": "session",
+                "#state": "state",
+                "#until": "attendant_active_until",
+                "#handoff": "human_handoff_requested_at",
+                "#previous": "_previous_state_before_attendant",
+                "#updatedAt": "updatedAt",
+                "#ttl": "ttl",
+            },
+            ExpressionAttributeValues={
+                ":welcome": ConversationState.WELCOME.value,
+                ":updatedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now)),
+                ":ttl": now + SESSION_TTL_SECONDS,
+            },
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        # No session: the bot already starts from WELCOME
+        pass
+    except Exception as e:
+        logger.error(f"[Webhook] Error deactivating attendant mode: {e}")
+        return
     logger.info(f"[Webhook] Modo atendente encerrado para {phone}")
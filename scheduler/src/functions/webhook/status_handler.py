@@ -1,5 +1,9 @@
 import json
 import logging
+import os
+import time
+
+import boto3
 
 from src.utils.http import parse_body, http_response
 from src.services.db.postgres import PostgresService
@@ -8,6 +12,13 @@ from src.services.message_tracker import MessageTracker
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+CLINIC_CACHE_TTL_SECONDS = 60
+
+# Reused across warm invocations of the same Lambda container
+_db = None
+_clinic_id_cache = {}
+_sqs = None
+
 
 def handler(event, context):
     """
@@ -16,62 +27,42 @@ def handler(event, context):
     POST /webhook/whatsapp/status
     Receives z-api MessageStatusCallback payloads.
     Status lifecycle: SENT -> RECEIVED -> READ -> PLAYED
+
+    Valid payloads are enqueued on the status-updates SQS queue and recorded by
+    process_queue; z-api gets its 200 without waiting for Postgres or DynamoDB.
     """
     try:
         body = parse_body(event)
         if not body:
             return http_response(200, {"status": "OK"})
 
-        logger.info(f"[StatusWebhook] Payload recebido: {json.dumps(body)[:500]}")
-
-        # 1. Identify clinic by instanceId
-        instance_id = body.get("instanceId", "")
-        if not instance_id:
-            logger.warning("[StatusWebhook] Payload sem instanceId")
-            return http_response(200, {"status": "OK"})
-
-        db = PostgresService()
-        clinics = db.execute_query(
-            "SELECT clinic_id FROM scheduler.clinics WHERE zapi_instance_id = %s AND active = TRUE",
-            (instance_id,),
+        logger.info(
+            "[StatusWebhook] Payload recebido: instanceId=%s status=%s ids=%s",
+            body.get("instanceId"), body.get("status"), body.get("ids"),
         )
 
-        if not clinics:
-            logger.warning(f"[StatusWebhook] Clinica não encontrada para instanceId={instance_id}")
+        # 1. Require instanceId
+        if not body.get("instanceId"):
+            logger.warning("[StatusWebhook] Payload sem instanceId")
             return http_response(200, {"status": "OK"})
 
-        clinic_id = clinics[0]["clinic_id"]
-
-        # 2. Extract status data
-        status = body.get("status", "")
-        message_ids = body.get("ids", [])
-        phone = body.get("phone", "")
-        timestamp = body.get("momment", 0)
-
-        if not status or not message_ids:
+        # 2. Validate status data before any downstream work
+        if not body.get("status") or not body.get("ids"):
             logger.warning("[StatusWebhook] Payload sem status ou ids")
             return http_response(200, {"status": "OK"})
 
-        # 3. Track status updates
-        tracker = MessageTracker()
-        updated_count = 0
-
-        for msg_id in message_ids:
-            tracker.update_status(
-                clinic_id=clinic_id,
-                phone=phone,
-                message_id=msg_id,
-                new_status=status,
-                timestamp=timestamp,
-                raw_payload=body,
+        # 3. Hand off to the queue consumer
+        try:
+            _get_sqs().send_message(
+                QueueUrl=os.environ["STATUS_UPDATES_QUEUE_URL"],
+                MessageBody=json.dumps(body),
             )
-            updated_count += 1
-
-        logger.info(
-            f"[StatusWebhook] Status '{status}' registrado para {updated_count} mensagem(ns) | "
-            f"clinic={clinic_id} phone={phone}"
-        )
+            return http_response(200, {"status": "OK", "queued": True})
+        except Exception as e:
+            # Never lose a status because the queue is unavailable: record it inline
+            logger.error(f"[StatusWebhook] Erro ao enfileirar status, gravando direto: {e}")
 
+        updated_count = _record_status(body)
         return http_response(200, {
             "status": "OK",
             "updatedCount": updated_count,
@@ -81,3 +72,77 @@ def handler(event, context):
         logger.error(f"[StatusWebhook] Erro interno: {e}")
         # Always return 200 to prevent z-api from retrying
         return http_response(200, {"status": "OK", "error": "internal"})
+
+
+def process_queue(event, context):
+    """
+    SQS consumer for the status-updates queue.
+
+    Records each enqueued status callback; failed records are reported back so
+    only they are retried (ReportBatchItemFailures).
+    """
+    failures = []
+    for record in event.get("Records", []):
+        try:
+            _record_status(json.loads(record["body"]))
+        except Exception as e:
+            logger.error(f"[StatusWebhook] Erro ao processar status {record.get('messageId')}: {e}")
+            failures.append({"itemIdentifier": record["messageId"]})
+
+    return {"batchItemFailures": failures}
+
+
+def _record_status(body: dict) -> int:
+    instance_id = body.get("instanceId", "")
+    status = body.get("status", "")
+    message_ids = body.get("ids", [])
+    phone = body.get("phone", "")
+    timestamp = body.get("momment", 0)
+
+    clinic_id = _resolve_clinic_id(instance_id)
+    if not clinic_id:
+        logger.warning(f"[StatusWebhook] Clinica não encontrada para instanceId={instance_id}")
+        return 0
+
+    tracker = MessageTracker()
+    updated_count = tracker.update_status_batch(
+        clinic_id=clinic_id,
+        phone=phone,
+        message_ids=message_ids,
+        new_status=status,
+        timestamp=timestamp,
+        raw_payload=body,
+        # A lost write must fail the SQS record so it is retried (and dead-lettered)
+        raise_errors=True,
+    )
+
+    logger.info(
+        f"[StatusWebhook] Status '{status}' registrado para {updated_count} mensagem(ns) | "
+        f"clinic={clinic_id} phone={phone}"
+    )
+    return updated_count
+
+
+def _get_sqs():
+    global _sqs
+    if _sqs is None:
+        _sqs = boto3.client("sqs")
+    return _sqs
+
+
+def _resolve_clinic_id(instance_id: str):
+    global _db
+    now = time.monotonic()
+    cached = _clinic_id_cache.get(instance_id)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    if _db is None:
+        _db = PostgresService()
+    clinic_id = _db.execute_scalar(
+        "SELECT clinic_id FROM scheduler.clinics WHERE zapi_instance_id = %s AND active = TRUE",
+        (instance_id,),
+    )
+    if clinic_id:
+        _clinic_id_cache[instance_id] = (now + CLINIC_CACHE_TTL_SECONDS, clinic_id)
+    return clinic_id
@@ -2,7 +2,8 @@ import logging
 import os
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional
 
 from src.utils.phone import normalize_phone
 
@@ -63,20 +64,18 @@ class WhatsAppProvider(ABC):
         ...
 
 
-def is_phone_allowed(phone: str) -> bool:
-    allowed_raw = os.environ.get("ALLOWED_PHONES", "").strip()
-    logger.info(f"Allowed phones: {allowed_raw}")
-    if not allowed_raw:
-        return False
-
+@lru_cache(maxsize=4)
+def _parse_allowed_phones(allowed_raw: str) -> Optional[FrozenSet[str]]:
+    """Normalized allowlist for an ALLOWED_PHONES value; None means every phone is allowed."""
     if allowed_raw == "*":
-        return True
+        return None
+    return frozenset(normalize_phone(p) for p in allowed_raw.split(",") if p.strip())
 
-    allowed_phones = {normalize_phone(p) for p in allowed_raw.split(",") if p.strip()}
-    normalized_phone = normalize_phone(phone)
-    logger.info(f"Normalized phone: {normalized_phone}")
-    logger.info(f"Allowed phones: {allowed_phones}")
-    logger.info(f"Is phone allowed: {normalized_phone in allowed_phones}")
+
+def is_phone_allowed(phone: str) -> bool:
+    allowed_phones = _parse_allowed_phones(os.environ.get("ALLOWED_PHONES", "").strip())
+    if allowed_phones is None:
+        return True
     return normalize_phone(phone) in allowed_phones
 
 
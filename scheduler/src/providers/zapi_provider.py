@@ -2,6 +2,8 @@ import logging
 from typing import Any, Dict, List, Optional
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from src.providers.whatsapp_provider import (
     WhatsAppProvider,
@@ -13,6 +15,28 @@ from src.providers.whatsapp_provider import (
 
 logger = logging.getLogger(__name__)
 
+# Shared across providers and warm invocations so keep-alive connections to
+# api.z-api.io are reused. Headers stay per request: Client-Token is per clinic.
+# Only connection failures are retried — a resent POST could duplicate a message.
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(
+    pool_maxsize=10,
+    max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2),
+))
+
+
+# Payload key -> (message_type, field holding the text content, field holding the
+# selected button/row id for response types), checked in priority order
+_MESSAGE_TYPES = (
+    ("buttonsResponseMessage", "BUTTON_RESPONSE", "message", "buttonId"),
+    ("listResponseMessage", "LIST_RESPONSE", "title", "selectedRowId"),
+    ("text", "TEXT", "message", None),
+    ("image", "IMAGE", "caption", None),
+    ("audio", "AUDIO", None, None),
+    ("video", "VIDEO", "caption", None),
+    ("document", "DOCUMENT", "title", None),
+)
+
 
 class ZApiProvider(WhatsAppProvider):
 
@@ -21,6 +45,8 @@ class ZApiProvider(WhatsAppProvider):
         self.instance_token = instance_token
         self.client_token = client_token
         self.base_url = f"https://api.z-api.io/instances/{instance_id}/token/{instance_token}"
+        self._send_text_url = f"{self.base_url}/send-text"
+        self._send_buttons_url = f"{self.base_url}/send-button-list"
         self.headers = {
             "Client-Token": client_token,
             "Content-Type": "application/json",
@@ -42,35 +68,13 @@ class ZApiProvider(WhatsAppProvider):
         if blocked:
             return blocked
 
-        url = f"{self.base_url}/send-text"
-        payload = {"phone": phone, "message": message}
-
-        try:
-            resp = requests.post(url, json=payload, headers=self.headers, timeout=15)
-            data = resp.json() if resp.content else {}
-
-            if resp.status_code == 200:
-                return ProviderResponse(
-                    success=True,
-                    provider_message_id=data.get("zaapId", data.get("messageId", "")),
-                    raw_response=data,
-                )
-            else:
-                return ProviderResponse(
-                    success=False,
-                    raw_response=data,
-                    error=f"z-api status {resp.status_code}: {data}",
-                )
-        except Exception as e:
-            logger.error(f"Erro ao enviar texto via z-api: {e}")
-            return ProviderResponse(success=False, error=str(e))
+        return self._post(self._send_text_url, {"phone": phone, "message": message})
 
     def send_buttons(self, phone: str, message: str, buttons: List[Dict[str, str]]) -> ProviderResponse:
         blocked = self._check_allowlist(phone)
         if blocked:
             return blocked
 
-        url = f"{self.base_url}/send-button-list"
         payload = {
             "phone": phone,
             "message": message,
@@ -79,22 +83,12 @@ class ZApiProvider(WhatsAppProvider):
             },
         }
 
-        try:
-            resp = requests.post(url, json=payload, headers=self.headers, timeout=15)
-            data = resp.json() if resp.content else {}
+        response = self._post(self._send_buttons_url, payload)
+        if response.success:
+            return response
 
-            if resp.status_code == 200:
-                return ProviderResponse(
-                    success=True,
-                    provider_message_id=data.get("zaapId", data.get("messageId", "")),
-                    raw_response=data,
-                )
-            else:
-                logger.warning(f"Botões falharam (status {resp.status_code}), usando fallback texto numerado")
-                return self._send_numbered_fallback(phone, message, buttons)
-        except Exception as e:
-            logger.warning(f"Botões falharam ({e}), usando fallback texto numerado")
-            return self._send_numbered_fallback(phone, message, buttons)
+        logger.warning(f"Botões falharam ({response.error}), usando fallback texto numerado")
+        return self._send_numbered_fallback(phone, message, buttons)
 
     def send_list(self, phone: str, message: str, button_text: str, sections: List[Dict]) -> ProviderResponse:
         blocked = self._check_allowlist(phone)
@@ -109,7 +103,28 @@ class ZApiProvider(WhatsAppProvider):
                 lines.append(f"{idx} - {row.get('title', row.get('label', ''))}")
                 idx += 1
 
-        return self.send_text(phone, "\n".join(lines))
+        return self._post(self._send_text_url, {"phone": phone, "message": "\n".join(lines)})
+
+    def _post(self, url: str, payload: Dict[str, Any]) -> ProviderResponse:
+        """POSTs to z-api; callers are responsible for the allowlist check."""
+        try:
+            resp = _session.post(url, json=payload, headers=self.headers, timeout=15)
+            data = resp.json() if resp.content else {}
+
+            if resp.status_code == 200:
+                return ProviderResponse(
+                    success=True,
+                    provider_message_id=data.get("zaapId", data.get("messageId", "")),
+                    raw_response=data,
+                )
+            return ProviderResponse(
+                success=False,
+                raw_response=data,
+                error=f"z-api status {resp.status_code}: {data}",
+            )
+        except Exception as e:
+            logger.error(f"Erro ao enviar mensagem via z-api: {e}")
+            return ProviderResponse(success=False, error=str(e))
 
     def parse_incoming_message(self, raw_payload: Dict[str, Any]) -> IncomingMessage:
         message_type = "TEXT"
@@ -118,47 +133,19 @@ class ZApiProvider(WhatsAppProvider):
         button_text = None
         reference_message_id = None
 
-        # Button response
-        if "buttonsResponseMessage" in raw_payload:
-            message_type = "BUTTON_RESPONSE"
-            btn = raw_payload["buttonsResponseMessage"]
-            button_id = btn.get("buttonId", "")
-            button_text = btn.get("message", "")
-            content = button_text
-            reference_message_id = raw_payload.get("referenceMessageId")
-
-        # List response
-        elif "listResponseMessage" in raw_payload:
-            message_type = "LIST_RESPONSE"
-            lst = raw_payload["listResponseMessage"]
-            button_id = lst.get("selectedRowId", "")
-            button_text = lst.get("title", "")
-            content = button_text
-            reference_message_id = raw_payload.get("referenceMessageId")
-
-        # Text message
-        elif "text" in raw_payload:
-            message_type = "TEXT"
-            content = raw_payload["text"].get("message", "")
-
-        # Image
-        elif "image" in raw_payload:
-            message_type = "IMAGE"
-            content = raw_payload["image"].get("caption", "")
-
-        # Audio
-        elif "audio" in raw_payload:
-            message_type = "AUDIO"
-
-        # Video
-        elif "video" in raw_payload:
-            message_type = "VIDEO"
-            content = raw_payload["video"].get("caption", "")
-
-        # Document
-        elif "document" in raw_payload:
-            message_type = "DOCUMENT"
-            content = raw_payload["document"].get("title", "")
+        for key, type_name, content_field, button_id_field in _MESSAGE_TYPES:
+            if key not in raw_payload:
+                continue
+            message_type = type_name
+            section = raw_payload[key]
+            if content_field:
+                content = section.get(content_field, "")
+            if button_id_field:
+                # Button/list responses: the label doubles as the content
+                button_id = section.get(button_id_field, "")
+                button_text = content
+                reference_message_id = raw_payload.get("referenceMessageId")
+            break
 
         return IncomingMessage(
             message_id=raw_payload.get("messageId", ""),
@@ -187,4 +174,5 @@ class ZApiProvider(WhatsAppProvider):
         for i, btn in enumerate(buttons, 1):
             lines.append(f"{i} - {btn['label']}")
 
-        return self.send_text(phone, "\n".join(lines))
+        # Allowlist already checked by send_buttons
+        return self._post(self._send_text_url, {"phone": phone, "message": "\n".join(lines)})
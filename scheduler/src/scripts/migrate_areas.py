@@ -106,17 +106,20 @@ def main():
 
     cursor = conn.cursor()
 
+    # One transaction for the whole migration; a savepoint per step keeps the
+    # "log the error and move on" behaviour without a commit (and WAL flush) per step.
     for i, sql in enumerate(MIGRATION_STEPS):
+        label = sql.strip().split('\n')[0][:80]
+        cursor.execute("SAVEPOINT migration_step")
         try:
             cursor.execute(sql)
-            conn.commit()
-            label = sql.strip().split('\n')[0][:80]
+            cursor.execute("RELEASE SAVEPOINT migration_step")
             print(f"[{i+1}/{len(MIGRATION_STEPS)}] OK: {label}")
         except Exception as e:
-            conn.rollback()
-            label = sql.strip().split('\n')[0][:80]
+            cursor.execute("ROLLBACK TO SAVEPOINT migration_step")
             print(f"[{i+1}/{len(MIGRATION_STEPS)}] ERRO: {label} -> {e}")
 
+    conn.commit()
     cursor.close()
     conn.close()
     print("\nMigration concluida.")
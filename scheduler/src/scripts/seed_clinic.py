@@ -22,7 +22,7 @@ def main():
     cursor = conn.cursor()
     cursor.execute("SET search_path TO scheduler, public")
 
-    # ── 1. Clinic ──────────────────────────────────────────────────────────
+    # ── 1. Clinic data ─────────────────────────────────────────────────────
     business_hours = {
         "mon": {"start": "09:00", "end": "18:00"},
         "tue": {"start": "09:00", "end": "18:00"},
@@ -48,89 +48,11 @@ def main():
         "• Em caso de uso de medicamentos fotossensibilizantes, informe nossa equipe."
     )
 
-    cursor.execute(
-        """
-        INSERT INTO clinics (clinic_id, name, phone, business_hours, buffer_minutes, max_session_minutes, welcome_intro_message, pre_session_instructions)
-        VALUES (%s, %s, %s, %s::jsonb, %s, %s, %s, %s)
-        ON CONFLICT (clinic_id) DO UPDATE SET
-            max_session_minutes = EXCLUDED.max_session_minutes,
-            welcome_intro_message = EXCLUDED.welcome_intro_message,
-            pre_session_instructions = EXCLUDED.pre_session_instructions,
-            updated_at = NOW()
-        RETURNING id, clinic_id
-        """,
-        ("laser-beauty-sp", "Laser Beauty SP", "5511988880000", json.dumps(business_hours), 10, 60, welcome_intro, pre_session_instructions),
-    )
-    conn.commit()
-    row = cursor.fetchone()
-    if row:
-        print(f"[1/6] Clinic criada: id={row[0]}, clinic_id={row[1]}")
-    else:
-        print("[1/6] Clinic ja existe (laser-beauty-sp) - skip")
-
     clinic_id = "laser-beauty-sp"
+    professional_name = "Dra. Ana Souza"
+    service_name = "Depilacao a laser"
 
-    # ── 2. Service ─────────────────────────────────────────────────────────
-    cursor.execute(
-        """
-        INSERT INTO services (id, clinic_id, name, duration_minutes, price_cents)
-        VALUES (gen_random_uuid(), %s, %s, %s, %s)
-        ON CONFLICT DO NOTHING
-        RETURNING id, name
-        """,
-        (clinic_id, "Depilacao a laser", 45, 15000),
-    )
-    conn.commit()
-    row = cursor.fetchone()
-    if row:
-        print(f"[2/6] Service criado: id={row[0]}, name={row[1]}")
-    else:
-        print("[2/6] Service ja existe - skip")
-
-    # ── 3. Professional ────────────────────────────────────────────────────
-    cursor.execute(
-        """
-        INSERT INTO professionals (id, clinic_id, name, role)
-        VALUES (gen_random_uuid(), %s, %s, %s)
-        ON CONFLICT DO NOTHING
-        RETURNING id, name
-        """,
-        (clinic_id, "Dra. Ana Souza", "Biomedica esteta"),
-    )
-    conn.commit()
-    row = cursor.fetchone()
-    if row:
-        professional_id = row[0]
-        print(f"[3/6] Professional criado: id={row[0]}, name={row[1]}")
-    else:
-        print("[3/6] Professional ja existe - skip")
-        cursor.execute(
-            "SELECT id FROM professionals WHERE clinic_id = %s AND name = %s",
-            (clinic_id, "Dra. Ana Souza"),
-        )
-        result = cursor.fetchone()
-        professional_id = result[0] if result else None
-
-    # ── 4. Availability Rules (mon-fri, 09:00-18:00) ──────────────────────
-    rules_inserted = 0
-    for day_of_week in range(1, 6):  # 1=mon .. 5=fri
-        cursor.execute(
-            """
-            INSERT INTO availability_rules (id, clinic_id, professional_id, day_of_week, start_time, end_time)
-            VALUES (gen_random_uuid(), %s, %s, %s, %s, %s)
-            ON CONFLICT DO NOTHING
-            RETURNING id
-            """,
-            (clinic_id, professional_id, day_of_week, "09:00", "18:00"),
-        )
-        conn.commit()
-        row = cursor.fetchone()
-        if row:
-            rules_inserted += 1
-
-    print(f"[4/6] Availability rules: {rules_inserted} criada(s), {5 - rules_inserted} ja existiam")
-
-    # ── 5. FAQ Items ───────────────────────────────────────────────────────
+    # ── 2. FAQ Items ───────────────────────────────────────────────────────
     faq_items = [
         (
             "EQUIPMENT",
@@ -164,43 +86,108 @@ def main():
         ),
     ]
 
-    faqs_inserted = 0
-    for question_key, question_label, answer, display_order in faq_items:
-        cursor.execute(
-            """
+    # ── 3. Single upsert ───────────────────────────────────────────────────
+    # Clinic, service, professional, availability rules (mon-fri 09:00-18:00),
+    # FAQ items and discount rules go in one statement / one round-trip. Every
+    # CTE sees the pre-statement snapshot, so existing rows are detected with
+    # NOT EXISTS / ON CONFLICT and reruns are no-ops.
+    faq_values = ", ".join(["(%s, %s, %s, %s::int)"] * len(faq_items))
+    faq_params = tuple(value for item in faq_items for value in item)
+
+    cursor.execute(
+        f"""
+        WITH clinic AS (
+            INSERT INTO clinics (clinic_id, name, phone, business_hours, buffer_minutes, max_session_minutes, welcome_intro_message, pre_session_instructions)
+            VALUES (%s, %s, %s, %s::jsonb, %s, %s, %s, %s)
+            ON CONFLICT (clinic_id) DO UPDATE SET
+                max_session_minutes = EXCLUDED.max_session_minutes,
+                welcome_intro_message = EXCLUDED.welcome_intro_message,
+                pre_session_instructions = EXCLUDED.pre_session_instructions,
+                updated_at = NOW()
+            RETURNING id, clinic_id
+        ),
+        svc AS (
+            INSERT INTO services (id, clinic_id, name, duration_minutes, price_cents)
+            SELECT gen_random_uuid(), c.clinic_id, %s, %s, %s
+            FROM clinic c
+            WHERE NOT EXISTS (SELECT 1 FROM services WHERE clinic_id = c.clinic_id AND name = %s)
+            RETURNING id
+        ),
+        existing_prof AS (
+            SELECT p.id FROM professionals p JOIN clinic c ON c.clinic_id = p.clinic_id
+            WHERE p.name = %s
+            LIMIT 1
+        ),
+        new_prof AS (
+            INSERT INTO professionals (id, clinic_id, name, role)
+            SELECT gen_random_uuid(), c.clinic_id, %s, %s
+            FROM clinic c
+            WHERE NOT EXISTS (SELECT 1 FROM existing_prof)
+            RETURNING id
+        ),
+        prof AS (
+            SELECT id FROM new_prof UNION ALL SELECT id FROM existing_prof
+        ),
+        rules AS (
+            INSERT INTO availability_rules (id, clinic_id, professional_id, day_of_week, start_time, end_time)
+            SELECT gen_random_uuid(), c.clinic_id, p.id, dow, '09:00', '18:00'
+            FROM clinic c, prof p, generate_series(1, 5) AS dow  -- 1=mon .. 5=fri
+            ON CONFLICT DO NOTHING
+            RETURNING id
+        ),
+        faq AS (
             INSERT INTO faq_items (id, clinic_id, question_key, question_label, answer, display_order)
-            VALUES (gen_random_uuid(), %s, %s, %s, %s, %s)
+            SELECT gen_random_uuid(), c.clinic_id, v.question_key, v.question_label, v.answer, v.display_order
+            FROM clinic c, (VALUES {faq_values}) AS v(question_key, question_label, answer, display_order)
             ON CONFLICT (clinic_id, question_key) DO NOTHING
             RETURNING id
-            """,
-            (clinic_id, question_key, question_label, answer, display_order),
+        ),
+        discount AS (
+            INSERT INTO discount_rules (id, clinic_id, first_session_discount_pct,
+                tier_2_min_areas, tier_2_max_areas, tier_2_discount_pct,
+                tier_3_min_areas, tier_3_discount_pct, is_active)
+            SELECT gen_random_uuid(), c.clinic_id, %s, %s, %s, %s, %s, %s, TRUE
+            FROM clinic c
+            ON CONFLICT (clinic_id) DO NOTHING
+            RETURNING id
         )
-        conn.commit()
-        row = cursor.fetchone()
-        if row:
-            faqs_inserted += 1
-
-    print(f"[5/6] FAQ items: {faqs_inserted} criado(s), {len(faq_items) - faqs_inserted} ja existiam")
-
-    # ── 6. Discount Rules ────────────────────────────────────────────────
-    cursor.execute(
-        """
-        INSERT INTO discount_rules (id, clinic_id, first_session_discount_pct,
-            tier_2_min_areas, tier_2_max_areas, tier_2_discount_pct,
-            tier_3_min_areas, tier_3_discount_pct, is_active)
-        VALUES (gen_random_uuid(), %s, %s, %s, %s, %s, %s, %s, TRUE)
-        ON CONFLICT (clinic_id) DO NOTHING
-        RETURNING id
+        SELECT
+            (SELECT id FROM clinic),
+            (SELECT id FROM svc),
+            (SELECT id FROM new_prof),
+            (SELECT count(*) FROM rules),
+            (SELECT count(*) FROM faq),
+            (SELECT id FROM discount)
         """,
-        (clinic_id, 20, 2, 4, 10, 5, 15),
+        (
+            clinic_id, "Laser Beauty SP", "5511988880000", json.dumps(business_hours), 10, 60, welcome_intro, pre_session_instructions,
+            service_name, 45, 15000, service_name,
+            professional_name,
+            professional_name, "Biomedica esteta",
+        )
+        + faq_params
+        + (20, 2, 4, 10, 5, 15),
     )
-    conn.commit()
-    row = cursor.fetchone()
-    if row:
-        print(f"[6/6] Discount rules criada: id={row[0]}")
+    clinic_row_id, service_id, professional_id, rules_inserted, faqs_inserted, discount_id = cursor.fetchone()
+
+    print(f"[1/6] Clinic upsert: id={clinic_row_id}, clinic_id={clinic_id}")
+    if service_id:
+        print(f"[2/6] Service criado: id={service_id}, name={service_name}")
+    else:
+        print("[2/6] Service ja existe - skip")
+    if professional_id:
+        print(f"[3/6] Professional criado: id={professional_id}, name={professional_name}")
+    else:
+        print("[3/6] Professional ja existe - skip")
+    print(f"[4/6] Availability rules: {rules_inserted} criada(s), {5 - rules_inserted} ja existiam")
+    print(f"[5/6] FAQ items: {faqs_inserted} criado(s), {len(faq_items) - faqs_inserted} ja existiam")
+    if discount_id:
+        print(f"[6/6] Discount rules criada: id={discount_id}")
     else:
         print("[6/6] Discount rules ja existe - skip")
 
+    # Single commit: any failure above leaves the database untouched
+    conn.commit()
     cursor.close()
     conn.close()
     print("\nSeed concluido com sucesso.")
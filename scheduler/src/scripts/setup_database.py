@@ -3,6 +3,7 @@ Script para criar o schema e tabelas do scheduler no PostgreSQL.
 Executar localmente: python -m src.scripts.setup_database
 """
 import os
+import re
 import sys
 import psycopg2
 from dotenv import load_dotenv
@@ -259,9 +260,6 @@ SQL_STATEMENTS = [
     "CREATE INDEX IF NOT EXISTS idx_appointments_clinic_date ON scheduler.appointments(clinic_id, appointment_date)",
     "CREATE INDEX IF NOT EXISTS idx_appointments_patient ON scheduler.appointments(patient_id)",
     "CREATE INDEX IF NOT EXISTS idx_appointments_status ON scheduler.appointments(clinic_id, status)",
-    "CREATE INDEX IF NOT EXISTS idx_patients_phone ON scheduler.patients(clinic_id, phone)",
-    "CREATE INDEX IF NOT EXISTS idx_availability_rules_clinic ON scheduler.availability_rules(clinic_id, day_of_week)",
-    "CREATE INDEX IF NOT EXISTS idx_availability_exceptions_clinic ON scheduler.availability_exceptions(clinic_id, exception_date)",
     "CREATE INDEX IF NOT EXISTS idx_appointment_services_appointment ON scheduler.appointment_services(appointment_id)",
 
     # Add duration_minutes override to service_areas (nullable, falls back to services.duration_minutes)
@@ -289,7 +287,6 @@ SQL_STATEMENTS = [
     )
     """,
 
-    "CREATE INDEX IF NOT EXISTS idx_appt_svc_areas_appointment ON scheduler.appointment_service_areas(appointment_id)",
 
     # Drop legacy TEXT areas column from appointments
     "ALTER TABLE scheduler.appointments DROP COLUMN IF EXISTS areas",
@@ -479,9 +476,135 @@ SQL_STATEMENTS = [
     # Soft-delete column on patients (set when patient is excluded by clinic owner)
     "ALTER TABLE scheduler.patients ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMPTZ",
     "CREATE INDEX IF NOT EXISTS idx_patients_deleted ON scheduler.patients(clinic_id, deleted_at)",
+
+    # Webhook clinic lookup by z-api instance (covers the clinic_id-only status lookup)
+    "CREATE INDEX IF NOT EXISTS idx_clinics_zapi_instance_active ON scheduler.clinics(zapi_instance_id) INCLUDE (clinic_id) WHERE active = TRUE",
+
+    # Upcoming appointments by patient (get_active_appointment(s)_by_phone): matches
+    # the WHERE and the ORDER BY, so no sort and no scan of past/cancelled rows
+    "CREATE INDEX IF NOT EXISTS idx_appointments_patient_confirmed_date ON scheduler.appointments(patient_id, appointment_date, start_time) WHERE status = 'CONFIRMED'",
+
+    # Live patient id by phone as an index-only scan; supersedes idx_patients_phone,
+    # which duplicated the UNIQUE(clinic_id, phone) index
+    "CREATE INDEX IF NOT EXISTS idx_patients_clinic_phone_live ON scheduler.patients(clinic_id, phone) INCLUDE (id) WHERE deleted_at IS NULL",
+    "DROP INDEX IF EXISTS scheduler.idx_patients_phone",
+
+    # Area names per appointment in created_at order (LATERAL string_agg in the
+    # active-appointment lookups): index-only scan, no sort. Supersedes
+    # idx_appt_svc_areas_appointment, whose single column is its prefix
+    "CREATE INDEX IF NOT EXISTS idx_asa_appointment_created ON scheduler.appointment_service_areas(appointment_id, created_at) INCLUDE (area_name)",
+    "DROP INDEX IF EXISTS scheduler.idx_appt_svc_areas_appointment",
+
+    # No two CONFIRMED appointments may overlap within a clinic (half-open ranges)
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_constraint WHERE conname = 'excl_appointments_no_overlap'
+        ) THEN
+            ALTER TABLE scheduler.appointments
+            ADD CONSTRAINT excl_appointments_no_overlap EXCLUDE USING gist (
+                clinic_id WITH =,
+                tsrange(appointment_date + start_time, appointment_date + end_time) WITH &&
+            ) WHERE (status = 'CONFIRMED');
+        END IF;
+    END $$
+    """,
+
+    # Partial indexes for the "active = TRUE" lookups: only live rows are indexed.
+    # Services and professionals by id still go through their primary keys;
+    # idx_availability_rules_clinic is superseded by the covering rules index below
+    "CREATE INDEX IF NOT EXISTS idx_services_clinic_active ON scheduler.services(clinic_id) WHERE active",
+    "CREATE INDEX IF NOT EXISTS idx_professionals_clinic_active ON scheduler.professionals(clinic_id) WHERE active",
+    "DROP INDEX IF EXISTS scheduler.idx_availability_rules_clinic",
+
+    # Covering indexes for the availability range query (and the booking conflict
+    # probes): the times are served from the index, no heap fetches. The rules
+    # and exceptions ones supersede the same-key indexes that older databases
+    # still carry, dropped below
+    "CREATE INDEX IF NOT EXISTS idx_appointments_clinic_confirmed_date ON scheduler.appointments(clinic_id, appointment_date) INCLUDE (start_time, end_time) WHERE status = 'CONFIRMED'",
+    "CREATE INDEX IF NOT EXISTS idx_availability_rules_clinic_active_covering ON scheduler.availability_rules(clinic_id, day_of_week) INCLUDE (rule_date, start_time, end_time) WHERE active",
+    "DROP INDEX IF EXISTS scheduler.idx_availability_rules_clinic_active",
+    "CREATE INDEX IF NOT EXISTS idx_availability_exceptions_clinic_covering ON scheduler.availability_exceptions(clinic_id, exception_date) INCLUDE (exception_type, start_time, end_time)",
+    "DROP INDEX IF EXISTS scheduler.idx_availability_exceptions_clinic",
 ]
 
 
+# Statement shapes whose target can be checked against the catalog up front.
+# Anything not matched here (DO blocks without a conname guard, ALTER COLUMN,
+# DROP COLUMN) always runs.
+_RE_CREATE_RELATION = re.compile(
+    r"^\s*CREATE\s+(?:UNIQUE\s+)?(?:TABLE|INDEX)\s+IF\s+NOT\s+EXISTS\s+(?:scheduler\.)?(\w+)", re.I
+)
+_RE_DROP_INDEX = re.compile(r"^\s*DROP\s+INDEX\s+IF\s+EXISTS\s+(?:scheduler\.)?(\w+)\s*$", re.I)
+_RE_ADD_COLUMN = re.compile(
+    r"^\s*ALTER\s+TABLE\s+scheduler\.(\w+)\s+ADD\s+COLUMN\s+IF\s+NOT\s+EXISTS\s+(\w+)[^,]*$", re.I | re.S
+)
+_RE_GUARDED_CONSTRAINT = re.compile(
+    r"^\s*DO\s+\$\$\s*BEGIN\s+IF\s+NOT\s+EXISTS\s*\(\s*SELECT\s+1\s+FROM\s+pg_constraint\s+"
+    r"WHERE\s+conname\s*=\s*'(\w+)'\s*\)",
+    re.I,
+)
+
+
+def _load_catalog(cursor):
+    """Snapshot existing scheduler relations, columns and constraints in one round-trip."""
+    cursor.execute(
+        """
+        SELECT 'rel', c.relname, NULL
+        FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'scheduler'
+        UNION ALL
+        SELECT 'col', table_name, column_name
+        FROM information_schema.columns
+        WHERE table_schema = 'scheduler'
+        UNION ALL
+        SELECT 'con', conname, NULL
+        FROM pg_constraint
+        """
+    )
+    catalog = {"rel": set(), "col": set(), "con": set()}
+    for kind, name, column in cursor.fetchall():
+        catalog[kind].add((name, column) if kind == "col" else name)
+    return catalog
+
+
+def _already_applied(sql, catalog):
+    match = _RE_CREATE_RELATION.match(sql)
+    if match:
+        return match.group(1) in catalog["rel"]
+    match = _RE_DROP_INDEX.match(sql)
+    if match:
+        return match.group(1) not in catalog["rel"]
+    match = _RE_ADD_COLUMN.match(sql)
+    if match:
+        return (match.group(1), match.group(2)) in catalog["col"]
+    match = _RE_GUARDED_CONSTRAINT.match(sql)
+    if match:
+        return match.group(1) in catalog["con"]
+    return False
+
+
+def _record_applied(sql, catalog):
+    """Keep the snapshot current so later statements see objects this run created or dropped."""
+    match = _RE_CREATE_RELATION.match(sql)
+    if match:
+        catalog["rel"].add(match.group(1))
+        return
+    match = _RE_DROP_INDEX.match(sql)
+    if match:
+        catalog["rel"].discard(match.group(1))
+        return
+    match = _RE_ADD_COLUMN.match(sql)
+    if match:
+        catalog["col"].add((match.group(1), match.group(2)))
+        return
+    match = _RE_GUARDED_CONSTRAINT.match(sql)
+    if match:
+        catalog["con"].add(match.group(1))
+
+
 def main():
     print("RDS HOST = ", os.environ.get("RDS_HOST"))
     conn = psycopg2.connect(
@@ -492,19 +615,31 @@ def main():
         password=os.environ.get("RDS_PASSWORD"),
     )
 
+    conn.autocommit = False
     cursor = conn.cursor()
 
+    # Objects already present are skipped without sending their DDL, so a
+    # re-run over a complete schema costs one catalog query instead of a lock
+    # and round-trip per statement.
+    catalog = _load_catalog(cursor)
+
+    # One transaction for the whole setup. Each statement is wrapped in a
+    # savepoint sent in the same round-trip, so a failing statement is rolled
+    # back on its own and the rest still apply, with a single commit at the end.
     for i, sql in enumerate(SQL_STATEMENTS):
+        label = sql.strip().split('\n')[0][:80]
+        if _already_applied(sql, catalog):
+            print(f"[{i+1}/{len(SQL_STATEMENTS)}] SKIP: {label}")
+            continue
         try:
-            cursor.execute(sql)
-            conn.commit()
-            label = sql.strip().split('\n')[0][:80]
+            cursor.execute(f"SAVEPOINT setup_step;\n{sql}\n;\nRELEASE SAVEPOINT setup_step")
             print(f"[{i+1}/{len(SQL_STATEMENTS)}] OK: {label}")
+            _record_applied(sql, catalog)
         except Exception as e:
-            conn.rollback()
-            label = sql.strip().split('\n')[0][:80]
+            cursor.execute("ROLLBACK TO SAVEPOINT setup_step")
             print(f"[{i+1}/{len(SQL_STATEMENTS)}] ERRO: {label} -> {e}")
 
+    conn.commit()
     cursor.close()
     conn.close()
     print("\nSetup concluído.")
@@ -1,4 +1,3 @@
-import json
 import logging
 from datetime import date, datetime
 from typing import Any, Dict, List, Optional
@@ -379,7 +378,7 @@ class ToolExecutor:
         clinic_id = context["clinic_id"]
         phone = context.get("phone", "")
 
-        logger.info(f"[ToolExecutor] Executing {tool_name} with args={json.dumps(arguments)[:200]}")
+        logger.info("[ToolExecutor] Executing %s with args=%.200r", tool_name, arguments)
 
         try:
             handler = getattr(self, f"_tool_{tool_name}", None)
@@ -758,30 +757,24 @@ class ToolExecutor:
             return {"has_instructions": False, "instructions": ""}
 
         # Get clinic-level instructions
-        clinic_rows = self.db.execute_query(
+        clinic_instructions = self.db.execute_scalar(
             "SELECT pre_session_instructions FROM scheduler.clinics WHERE clinic_id = %s",
             (clinic_id,),
-        )
-        clinic_instructions = ""
-        if clinic_rows and clinic_rows[0].get("pre_session_instructions"):
-            clinic_instructions = clinic_rows[0]["pre_session_instructions"]
+        ) or ""
 
         # Get service_area-level instructions (more specific, take priority)
         sa_instructions = ""
         if service_area_pairs:
-            values_clause = ", ".join(["(%s::uuid, %s::uuid)"] * len(service_area_pairs))
-            params = ()
-            for pair in service_area_pairs:
-                params += (pair["service_id"], pair["area_id"])
             rows = self.db.execute_query(
-                f"""
+                """
                 SELECT pre_session_instructions
-                FROM (VALUES {values_clause}) AS pairs(service_id, area_id)
+                FROM unnest(%s::uuid[], %s::uuid[]) WITH ORDINALITY AS pairs(service_id, area_id, ord)
                 JOIN scheduler.service_areas sa ON sa.service_id = pairs.service_id AND sa.area_id = pairs.area_id
                 WHERE sa.pre_session_instructions IS NOT NULL
                 AND sa.active = TRUE
+                ORDER BY pairs.ord
                 """,
-                params,
+                ([pair["service_id"] for pair in service_area_pairs], [pair["area_id"] for pair in service_area_pairs]),
             )
             sa_parts = [r["pre_session_instructions"] for r in rows if r.get("pre_session_instructions")]
             sa_instructions = "\n".join(sa_parts)
@@ -1,11 +1,34 @@
 import logging
+from time import monotonic
 from datetime import datetime, date, timedelta
 from typing import Any, Dict, List, Optional
 
+from psycopg2.errors import ExclusionViolation
+
 from src.services.db.postgres import PostgresService
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_PROFESSIONAL_CACHE_TTL_SECONDS = 300
+
+# clinic_id -> (expires_at, professional_id); reused across warm invocations.
+# Professional CRUD runs in other Lambdas, so staleness is bounded by the TTL.
+_default_professional_cache: Dict[str, tuple] = {}
+
+# Fixed hot-path statements run as server-side prepared statements
+_Q_CONFIRMED_APPOINTMENT = "SELECT * FROM scheduler.appointments WHERE id = $1::uuid AND status = 'CONFIRMED'"
+_Q_RESCHEDULE_APPOINTMENT = """
+    SELECT a.*, COALESCE(
+        NULLIF(a.total_duration_minutes, 0),
+        (SELECT NULLIF(SUM(duration_minutes), 0) FROM scheduler.appointment_service_areas WHERE appointment_id = a.id),
+        (SELECT NULLIF(SUM(duration_minutes), 0) FROM scheduler.appointment_services WHERE appointment_id = a.id),
+        (SELECT duration_minutes FROM scheduler.services WHERE id = a.service_id),
+        60
+    ) AS resolved_duration_minutes
+    FROM scheduler.appointments a
+    WHERE a.id = $1::uuid AND a.status = 'CONFIRMED'
+"""
+
 
 class ConflictError(Exception):
     pass
@@ -19,6 +42,15 @@ class OptimisticLockError(Exception):
     pass
 
 
+def _to_minutes(hhmm: str) -> int:
+    hours, _, minutes = hhmm.partition(":")
+    return int(hours) * 60 + int(minutes[:2])
+
+
+def _format_minutes(total_minutes: int) -> str:
+    return "%02d:%02d" % divmod(total_minutes, 60)
+
+
 class AppointmentService:
 
     def __init__(self, db: PostgresService, reminder_service=None, lead_service=None):
@@ -43,60 +75,59 @@ class AppointmentService:
         final_price_cents: Optional[int] = None,
         full_name: Optional[str] = None,
     ) -> Dict[str, Any]:
-        # 1. Get or create patient
-        patient = self._get_or_create_patient(clinic_id, phone)
-        patient_id = str(patient["id"])
+        # psycopg2 has no pipeline mode, so the booking is kept to two round-trips
+        # on a warm container: the services/totals lookup and the final statement.
+
+        # 1. Patient: normalized here, upserted by the final statement (step 5)
+        from src.utils.phone import normalize_phone
+        phone = normalize_phone(phone)
 
         # 2. Resolve service list and duration
         all_service_ids = service_ids if service_ids else [service_id]
         primary_service_id = all_service_ids[0]
 
-        # Fetch base service info
-        placeholders = ", ".join(["%s"] * len(all_service_ids))
+        pair_service_ids = [pair["service_id"] for pair in service_area_pairs] if service_area_pairs else []
+        pair_area_ids = [pair["area_id"] for pair in service_area_pairs] if service_area_pairs else []
+
+        # Fetch base service info plus, for (service, area) pairs, the summed
+        # duration/price with area-specific overrides - all in one round-trip
         services = self.db.execute_query(
-            f"SELECT id, duration_minutes, name, price_cents FROM scheduler.services WHERE id::text IN ({placeholders}) AND active = TRUE",
-            tuple(all_service_ids),
+            """
+            WITH pairs AS (
+                SELECT * FROM unnest(%s::uuid[], %s::uuid[]) AS p(service_id, area_id)
+            ),
+            pair_totals AS (
+                SELECT SUM(COALESCE(sa.duration_minutes, s.duration_minutes)) AS total_duration,
+                       SUM(COALESCE(sa.price_cents, s.price_cents)) AS total_price
+                FROM pairs
+                JOIN scheduler.services s ON s.id = pairs.service_id AND s.active = TRUE
+                LEFT JOIN scheduler.service_areas sa ON sa.service_id = pairs.service_id AND sa.area_id = pairs.area_id AND sa.active = TRUE
+            )
+            SELECT s.id, s.duration_minutes, s.name, s.price_cents,
+                   pt.total_duration AS pairs_duration, pt.total_price AS pairs_price
+            FROM scheduler.services s
+            CROSS JOIN pair_totals pt
+            WHERE s.id::text = ANY(%s) AND s.active = TRUE
+            """,
+            (pair_service_ids, pair_area_ids, list(all_service_ids)),
         )
         if not services:
             raise NotFoundError(f"Serviço(s) não encontrado(s)")
 
-        # Build a lookup by id for ordering and data
-        svc_lookup = {str(s["id"]): s for s in services}
+        pairs_duration = services[0]["pairs_duration"]
+        pairs_price = services[0]["pairs_price"]
 
         if total_duration_minutes:
             duration_minutes = int(total_duration_minutes)
-        elif service_area_pairs:
-            # Sum duration for each (service, area) pair with area-specific override
-            values_clause = ", ".join(["(%s::uuid, %s::uuid)"] * len(service_area_pairs))
-            params = ()
-            for pair in service_area_pairs:
-                params += (pair["service_id"], pair["area_id"])
-            rows = self.db.execute_query(
-                f"""SELECT SUM(COALESCE(sa.duration_minutes, s.duration_minutes)) as total_duration
-                FROM (VALUES {values_clause}) AS pairs(service_id, area_id)
-                JOIN scheduler.services s ON s.id = pairs.service_id AND s.active = TRUE
-                LEFT JOIN scheduler.service_areas sa ON sa.service_id = pairs.service_id AND sa.area_id = pairs.area_id AND sa.active = TRUE""",
-                params,
-            )
-            duration_minutes = int(rows[0]["total_duration"]) if rows and rows[0]["total_duration"] else sum(s["duration_minutes"] for s in services)
+        elif service_area_pairs and pairs_duration:
+            duration_minutes = int(pairs_duration)
         else:
             duration_minutes = sum(s["duration_minutes"] for s in services)
 
         # 2b. Auto-calculate prices when not provided by caller
         if original_price_cents is None:
             if service_area_pairs:
-                values_clause = ", ".join(["(%s::uuid, %s::uuid)"] * len(service_area_pairs))
-                price_params = ()
-                for pair in service_area_pairs:
-                    price_params += (pair["service_id"], pair["area_id"])
-                price_rows = self.db.execute_query(
-                    f"""SELECT SUM(COALESCE(sa.price_cents, s.price_cents)) as total_price
-                    FROM (VALUES {values_clause}) AS pairs(service_id, area_id)
-                    JOIN scheduler.services s ON s.id = pairs.service_id AND s.active = TRUE
-                    LEFT JOIN scheduler.service_areas sa ON sa.service_id = pairs.service_id AND sa.area_id = pairs.area_id AND sa.active = TRUE""",
-                    price_params,
-                )
-                original_price_cents = int(price_rows[0]["total_price"]) if price_rows and price_rows[0]["total_price"] else None
+                original_price_cents = int(pairs_price) if pairs_price else None
             else:
                 original_price_cents = sum(s.get("price_cents") or 0 for s in services) or None
 
@@ -104,131 +135,132 @@ class AppointmentService:
                 final_price_cents = original_price_cents * (100 - discount_pct) // 100
 
         # 3. Calculate end_time
-        start_parts = time.split(":")
-        start_hour, start_min = int(start_parts[0]), int(start_parts[1])
-        total_minutes = start_hour * 60 + start_min + duration_minutes
-        end_hour, end_min = total_minutes // 60, total_minutes % 60
-        end_time = f"{end_hour:02d}:{end_min:02d}"
+        end_time = _format_minutes(_to_minutes(time) + duration_minutes)
 
-        # 4. Check for conflicts
-        conflicts = self.db.execute_query(
-            """
-            SELECT id FROM scheduler.appointments
-            WHERE clinic_id = %s AND appointment_date = %s AND status = 'CONFIRMED'
-            AND (
-                (start_time < %s::time AND end_time > %s::time)
-                OR (start_time < %s::time AND end_time > %s::time)
-                OR (start_time >= %s::time AND end_time <= %s::time)
-            )
-            """,
-            (clinic_id, date, end_time, time, end_time, time, time, end_time),
-        )
-
-        if conflicts:
-            raise ConflictError(f"Conflito de horário: já existe agendamento para {date} {time}-{end_time}")
-
-        # 5. Resolve professional
+        # 4. Resolve professional
         prof_id_param = None
         if professional_id:
             prof_id_param = professional_id
         else:
-            professionals = self.db.execute_query(
-                "SELECT id FROM scheduler.professionals WHERE clinic_id = %s AND active = TRUE LIMIT 1",
-                (clinic_id,),
-            )
-            if professionals:
-                prof_id_param = str(professionals[0]["id"])
-
-        # 6. Insert appointment
-        result = self.db.execute_write_returning(
-            """
-            INSERT INTO scheduler.appointments (
-                clinic_id, patient_id, professional_id, service_id,
-                appointment_date, start_time, end_time,
-                total_duration_minutes,
-                discount_pct, discount_reason, original_price_cents, final_price_cents,
-                full_name,
-                status, created_at, updated_at, version
-            ) VALUES (
-                %s, %s::uuid, %s::uuid, %s::uuid,
-                %s, %s::time, %s::time,
-                %s,
-                %s, %s, %s, %s,
-                %s,
-                'CONFIRMED', NOW(), NOW(), 1
+            prof_id_param = self._get_default_professional_id(clinic_id)
+
+        # 5. Patient upsert, conflict check, appointment insert and junction rows
+        # in one statement.
+        # The insert only happens when no overlapping CONFIRMED appointment exists,
+        # so an empty result means the slot was taken; a concurrent booking that
+        # slips past the probe is rejected by excl_appointments_no_overlap.
+        # Services WITH areas -> appointment_service_areas (1 row per pair);
+        # services WITHOUT areas -> appointment_services.
+        # (the fetched rows are exactly the requested services that exist and are active)
+        plain_service_ids = [] if service_area_pairs else [s["id"] for s in services]
+
+        try:
+            result = self.db.execute_write_returning(
+                """
+                WITH prev_patient AS (
+                    SELECT deleted_at FROM scheduler.patients WHERE clinic_id = %s AND phone = %s
+                ),
+                -- Get or create the patient on UNIQUE(clinic_id, phone), restoring a
+                -- soft-deleted one in place; DO UPDATE so RETURNING always yields the row
+                patient AS (
+                    INSERT INTO scheduler.patients AS p (clinic_id, phone, created_at, updated_at)
+                    VALUES (%s, %s, NOW(), NOW())
+                    ON CONFLICT (clinic_id, phone) DO UPDATE
+                    SET deleted_at = NULL,
+                        updated_at = CASE WHEN p.deleted_at IS NULL THEN p.updated_at ELSE NOW() END
+                    RETURNING p.id
+                ),
+                conflict AS (
+                    SELECT 1 FROM scheduler.appointments
+                    WHERE clinic_id = %s AND appointment_date = %s AND status = 'CONFIRMED'
+                    AND start_time < %s::time AND end_time > %s::time
+                    LIMIT 1
+                ),
+                appt AS (
+                    INSERT INTO scheduler.appointments (
+                        clinic_id, patient_id, professional_id, service_id,
+                        appointment_date, start_time, end_time,
+                        total_duration_minutes,
+                        discount_pct, discount_reason, original_price_cents, final_price_cents,
+                        full_name,
+                        status, created_at, updated_at, version
+                    )
+                    SELECT
+                        %s, patient.id, %s::uuid, %s::uuid,
+                        %s, %s::time, %s::time,
+                        %s,
+                        %s, %s, %s, %s,
+                        %s,
+                        'CONFIRMED', NOW(), NOW(), 1
+                    FROM patient
+                    WHERE NOT EXISTS (SELECT 1 FROM conflict)
+                    RETURNING *
+                ),
+                pairs AS (
+                    SELECT DISTINCT * FROM unnest(%s::uuid[], %s::uuid[]) AS p(service_id, area_id)
+                ),
+                ins_areas AS (
+                    INSERT INTO scheduler.appointment_service_areas
+                        (appointment_id, service_id, area_id, area_name, service_name, duration_minutes, price_cents)
+                    SELECT appt.id, pairs.service_id, pairs.area_id, a.name, s.name,
+                           COALESCE(sa.duration_minutes, s.duration_minutes),
+                           COALESCE(sa.price_cents, s.price_cents)
+                    FROM appt
+                    CROSS JOIN pairs
+                    JOIN scheduler.services s ON s.id = pairs.service_id
+                    JOIN scheduler.areas a ON a.id = pairs.area_id
+                    LEFT JOIN scheduler.service_areas sa ON sa.service_id = pairs.service_id AND sa.area_id = pairs.area_id AND sa.active = TRUE
+                    RETURNING 1
+                ),
+                ins_services AS (
+                    INSERT INTO scheduler.appointment_services
+                        (appointment_id, service_id, service_name, duration_minutes, price_cents)
+                    SELECT appt.id, s.id, s.name, s.duration_minutes, s.price_cents
+                    FROM appt
+                    JOIN scheduler.services s ON s.id = ANY(%s::uuid[])
+                    RETURNING 1
+                )
+                SELECT appt.*, (SELECT deleted_at IS NOT NULL FROM prev_patient) AS patient_restored
+                FROM appt
+                """,
+                (clinic_id, phone,
+                 clinic_id, phone,
+                 clinic_id, date, end_time, time,
+                 clinic_id, prof_id_param, primary_service_id,
+                 date, time, end_time,
+                 duration_minutes,
+                 discount_pct, discount_reason, original_price_cents, final_price_cents,
+                 full_name,
+                 pair_service_ids, pair_area_ids,
+                 plain_service_ids),
             )
-            RETURNING *
-            """,
-            (clinic_id, patient_id, prof_id_param, primary_service_id,
-             date, time, end_time,
-             duration_minutes,
-             discount_pct, discount_reason, original_price_cents, final_price_cents,
-             full_name),
-        )
+        except ExclusionViolation:
+            raise ConflictError(f"Conflito de horário: já existe agendamento para {date} {time}-{end_time}")
 
         if not result:
-            raise Exception("Erro ao criar agendamento")
+            raise ConflictError(f"Conflito de horário: já existe agendamento para {date} {time}-{end_time}")
 
         appointment_id = str(result["id"])
 
-        # 7. Insert into junction tables
-        if service_area_pairs:
-            # Services WITH areas -> appointment_service_areas (1 row per pair)
-            # Fetch info for each pair
-            values_clause = ", ".join(["(%s::uuid, %s::uuid)"] * len(service_area_pairs))
-            params = ()
-            for pair in service_area_pairs:
-                params += (pair["service_id"], pair["area_id"])
-            pair_rows = self.db.execute_query(
-                f"""SELECT pairs.service_id, pairs.area_id,
-                       s.name as service_name, a.name as area_name,
-                       COALESCE(sa.duration_minutes, s.duration_minutes) as duration_minutes,
-                       COALESCE(sa.price_cents, s.price_cents) as price_cents
-                FROM (VALUES {values_clause}) AS pairs(service_id, area_id)
-                JOIN scheduler.services s ON s.id = pairs.service_id
-                JOIN scheduler.areas a ON a.id = pairs.area_id
-                LEFT JOIN scheduler.service_areas sa ON sa.service_id = pairs.service_id AND sa.area_id = pairs.area_id AND sa.active = TRUE""",
-                params,
+        if result.pop("patient_restored", None):
+            logger.info(
+                f"[AppointmentService] Patient restored from soft-delete: id={result['patient_id']} phone={phone}"
             )
-            for row in pair_rows:
-                self.db.execute_write(
-                    """
-                    INSERT INTO scheduler.appointment_service_areas
-                        (appointment_id, service_id, area_id, area_name, service_name, duration_minutes, price_cents)
-                    VALUES (%s::uuid, %s::uuid, %s::uuid, %s, %s, %s, %s)
-                    """,
-                    (appointment_id, str(row["service_id"]), str(row["area_id"]),
-                     row["area_name"], row["service_name"],
-                     row["duration_minutes"], row.get("price_cents")),
-                )
-        else:
-            # Services WITHOUT areas -> appointment_services (as before)
-            for sid in all_service_ids:
-                svc = svc_lookup.get(sid)
-                if svc:
-                    self.db.execute_write(
-                        """
-                        INSERT INTO scheduler.appointment_services
-                            (appointment_id, service_id, service_name, duration_minutes, price_cents)
-                        VALUES (%s::uuid, %s::uuid, %s, %s, %s)
-                        """,
-                        (appointment_id, sid, svc["name"], svc["duration_minutes"], svc.get("price_cents")),
-                    )
 
         logger.info(
-            f"[AppointmentService] Agendamento criado: id={result['id']} "
+            f"[AppointmentService] Agendamento criado: id={appointment_id} "
             f"clinic={clinic_id} date={date} time={time} services={len(all_service_ids)} "
             f"service_area_pairs={len(service_area_pairs) if service_area_pairs else 0}"
         )
 
-        # 8. Schedule reminder (if available)
+        # 6. Schedule reminder (if available)
         if self.reminder_service:
             try:
                 self.reminder_service.schedule_reminder(result)
             except Exception as e:
                 logger.error(f"[AppointmentService] Erro ao agendar lembrete: {e}")
 
-        # 9. Mark lead as booked (if lead exists for this phone+clinic)
+        # 7. Mark lead as booked (if lead exists for this phone+clinic)
         if self.lead_service:
             try:
                 self.lead_service.mark_as_booked(
@@ -245,10 +277,9 @@ class AppointmentService:
     def reschedule_appointment(
         self, appointment_id: str, new_date: str, new_time: str
     ) -> Dict[str, Any]:
-        # 1. Fetch with optimistic lock
-        appointments = self.db.execute_query(
-            "SELECT * FROM scheduler.appointments WHERE id = %s::uuid AND status = 'CONFIRMED'",
-            (appointment_id,),
+        # 1. Fetch with optimistic lock, resolving the duration in the same query
+        appointments = self.db.execute_prepared(
+            "q_reschedule_appointment", _Q_RESCHEDULE_APPOINTMENT, (appointment_id,),
         )
 
         if not appointments:
@@ -258,84 +289,60 @@ class AppointmentService:
         current_version = appointment.get("version", 1)
         clinic_id = appointment["clinic_id"]
 
-        # 2. Get duration: prefer total_duration_minutes, then appointment_service_areas, then appointment_services, then service default
-        duration_minutes = appointment.get("total_duration_minutes")
-        if not duration_minutes:
-            # Try appointment_service_areas first (services with areas)
-            asa_junction = self.db.execute_query(
-                "SELECT SUM(duration_minutes) as total FROM scheduler.appointment_service_areas WHERE appointment_id = %s::uuid",
-                (appointment_id,),
-            )
-            if asa_junction and asa_junction[0].get("total"):
-                duration_minutes = int(asa_junction[0]["total"])
-            else:
-                # Try appointment_services (services without areas)
-                junction = self.db.execute_query(
-                    "SELECT SUM(duration_minutes) as total FROM scheduler.appointment_services WHERE appointment_id = %s::uuid",
-                    (appointment_id,),
-                )
-                if junction and junction[0].get("total"):
-                    duration_minutes = int(junction[0]["total"])
-                else:
-                    services = self.db.execute_query(
-                        "SELECT duration_minutes FROM scheduler.services WHERE id = %s::uuid",
-                        (str(appointment["service_id"]),),
-                    )
-                    duration_minutes = services[0]["duration_minutes"] if services else 60
+        # 2. Duration: total_duration_minutes, then appointment_service_areas, then
+        # appointment_services, then service default (resolved by the query above)
+        duration_minutes = appointment.pop("resolved_duration_minutes")
 
         # 3. Calculate new end_time
         duration_minutes = int(duration_minutes)
-        start_parts = new_time.split(":")
-        start_hour, start_min = int(start_parts[0]), int(start_parts[1])
-        total_minutes = start_hour * 60 + start_min + duration_minutes
-        end_hour, end_min = total_minutes // 60, total_minutes % 60
-        new_end_time = f"{end_hour:02d}:{end_min:02d}"
+        new_end_time = _format_minutes(_to_minutes(new_time) + duration_minutes)
 
-        # 4. Check conflicts in new slot
-        conflicts = self.db.execute_query(
-            """
-            SELECT id FROM scheduler.appointments
-            WHERE clinic_id = %s AND appointment_date = %s AND status = 'CONFIRMED'
-            AND id != %s::uuid
-            AND (
-                (start_time < %s::time AND end_time > %s::time)
-                OR (start_time < %s::time AND end_time > %s::time)
-                OR (start_time >= %s::time AND end_time <= %s::time)
+        # 4. Conflict check + update with optimistic lock in one statement,
+        # returning the updated row
+        conflict_message = f"Conflito de horário no novo slot: {new_date} {new_time}-{new_end_time}"
+        try:
+            outcome = self.db.execute_write_returning(
+                """
+                WITH conflict AS (
+                    SELECT 1 FROM scheduler.appointments
+                    WHERE clinic_id = %s AND appointment_date = %s AND status = 'CONFIRMED'
+                    AND id != %s::uuid
+                    AND start_time < %s::time AND end_time > %s::time
+                    LIMIT 1
+                ),
+                upd AS (
+                    UPDATE scheduler.appointments
+                    SET appointment_date = %s, start_time = %s::time, end_time = %s::time,
+                        version = version + 1, updated_at = NOW()
+                    WHERE id = %s::uuid AND version = %s
+                    AND NOT EXISTS (SELECT 1 FROM conflict)
+                    RETURNING *
+                )
+                -- Always one row: the updated appointment (all NULL when nothing
+                -- was updated) plus the conflict flag
+                SELECT upd.*, EXISTS (SELECT 1 FROM conflict) AS has_conflict
+                FROM (SELECT 1) AS one
+                LEFT JOIN upd ON TRUE
+                """,
+                (clinic_id, new_date, appointment_id, new_end_time, new_time,
+                 new_date, new_time, new_end_time, appointment_id, current_version),
             )
-            """,
-            (clinic_id, new_date, appointment_id, new_end_time, new_time, new_end_time, new_time, new_time, new_end_time),
-        )
-
-        if conflicts:
-            raise ConflictError(f"Conflito de horário no novo slot: {new_date} {new_time}-{new_end_time}")
+        except ExclusionViolation:
+            raise ConflictError(conflict_message)
 
-        # 5. Update with optimistic lock
-        updated_rows = self.db.execute_write(
-            """
-            UPDATE scheduler.appointments
-            SET appointment_date = %s, start_time = %s::time, end_time = %s::time,
-                version = version + 1, updated_at = NOW()
-            WHERE id = %s::uuid AND version = %s
-            """,
-            (new_date, new_time, new_end_time, appointment_id, current_version),
-        )
-
-        if updated_rows == 0:
+        if outcome.pop("has_conflict"):
+            raise ConflictError(conflict_message)
+        if outcome["id"] is None:
             raise OptimisticLockError("Agendamento foi modificado por outro processo")
+        updated_appointment = outcome
 
-        # 6. Cancel old reminder and schedule new
+        # 5. Cancel old reminder and schedule new
         if self.reminder_service:
             try:
                 self.reminder_service.cancel_reminder(appointment_id)
             except Exception as e:
                 logger.error(f"[AppointmentService] Erro ao cancelar lembrete antigo: {e}")
 
-        result = self.db.execute_query(
-            "SELECT * FROM scheduler.appointments WHERE id = %s::uuid",
-            (appointment_id,),
-        )
-        updated_appointment = result[0] if result else appointment
-
         if self.reminder_service:
             try:
                 self.reminder_service.schedule_reminder(updated_appointment)
@@ -357,9 +364,8 @@ class AppointmentService:
     ) -> Dict[str, Any]:
         """Update the service and areas of an existing appointment, recalculating duration/end_time."""
         # 1. Fetch appointment with optimistic lock
-        appointments = self.db.execute_query(
-            "SELECT * FROM scheduler.appointments WHERE id = %s::uuid AND status = 'CONFIRMED'",
-            (appointment_id,),
+        appointments = self.db.execute_prepared(
+            "q_confirmed_appointment", _Q_CONFIRMED_APPOINTMENT, (appointment_id,),
         )
         if not appointments:
             raise NotFoundError(f"Agendamento {appointment_id} não encontrado ou não confirmado")
@@ -368,7 +374,9 @@ class AppointmentService:
         current_version = appointment.get("version", 1)
         clinic_id = appointment["clinic_id"]
         appt_date = str(appointment["appointment_date"])
-        start_time = str(appointment["start_time"])[:5]
+        start = appointment["start_time"]  # TIME column -> datetime.time
+        start_minutes = start.hour * 60 + start.minute
+        start_time = f"{start.hour:02d}:{start.minute:02d}"
 
         # 2. Validate service exists
         services = self.db.execute_query(
@@ -383,17 +391,13 @@ class AppointmentService:
         # 3. Calculate new duration and price
         discount_pct = appointment.get("discount_pct") or 0
         if service_area_pairs:
-            values_clause = ", ".join(["(%s::uuid, %s::uuid)"] * len(service_area_pairs))
-            params: tuple = ()
-            for pair in service_area_pairs:
-                params += (pair["serviceId"], pair["areaId"])
             rows = self.db.execute_query(
-                f"""SELECT SUM(COALESCE(sa.duration_minutes, s.duration_minutes)) as total_duration,
+                """SELECT SUM(COALESCE(sa.duration_minutes, s.duration_minutes)) as total_duration,
                        SUM(COALESCE(sa.price_cents, s.price_cents)) as total_price
-                FROM (VALUES {values_clause}) AS pairs(service_id, area_id)
+                FROM unnest(%s::uuid[], %s::uuid[]) AS pairs(service_id, area_id)
                 JOIN scheduler.services s ON s.id = pairs.service_id AND s.active = TRUE
                 LEFT JOIN scheduler.service_areas sa ON sa.service_id = pairs.service_id AND sa.area_id = pairs.area_id AND sa.active = TRUE""",
-                params,
+                ([pair["serviceId"] for pair in service_area_pairs], [pair["areaId"] for pair in service_area_pairs]),
             )
             duration_minutes = int(rows[0]["total_duration"]) if rows and rows[0]["total_duration"] else svc["duration_minutes"]
             original_price_cents = int(rows[0]["total_price"]) if rows and rows[0]["total_price"] else svc.get("price_cents")
@@ -404,11 +408,7 @@ class AppointmentService:
         final_price_cents = original_price_cents * (100 - discount_pct) // 100 if original_price_cents else original_price_cents
 
         # 4. Calculate new end_time
-        start_parts = start_time.split(":")
-        start_hour, start_min = int(start_parts[0]), int(start_parts[1])
-        total_minutes = start_hour * 60 + start_min + duration_minutes
-        end_hour, end_min = total_minutes // 60, total_minutes % 60
-        new_end_time = f"{end_hour:02d}:{end_min:02d}"
+        new_end_time = _format_minutes(start_minutes + duration_minutes)
 
         # 5. Check conflicts with new duration
         conflicts = self.db.execute_query(
@@ -416,84 +416,112 @@ class AppointmentService:
             SELECT id FROM scheduler.appointments
             WHERE clinic_id = %s AND appointment_date = %s AND status = 'CONFIRMED'
             AND id != %s::uuid
-            AND (
-                (start_time < %s::time AND end_time > %s::time)
-                OR (start_time < %s::time AND end_time > %s::time)
-                OR (start_time >= %s::time AND end_time <= %s::time)
-            )
+            AND start_time < %s::time AND end_time > %s::time
             """,
-            (clinic_id, appt_date, appointment_id, new_end_time, start_time, new_end_time, start_time, start_time, new_end_time),
+            (clinic_id, appt_date, appointment_id, new_end_time, start_time),
         )
         if conflicts:
             raise ConflictError(f"Conflito de horário com nova duração: {appt_date} {start_time}-{new_end_time}")
 
-        # 6. Update appointment record
-        updated_rows = self.db.execute_write(
-            """
-            UPDATE scheduler.appointments
-            SET service_id = %s::uuid, end_time = %s::time, total_duration_minutes = %s,
-                original_price_cents = %s, final_price_cents = %s,
-                version = version + 1, updated_at = NOW()
-            WHERE id = %s::uuid AND version = %s
-            """,
-            (service_id, new_end_time, duration_minutes, original_price_cents, final_price_cents, appointment_id, current_version),
-        )
-        if updated_rows == 0:
-            raise OptimisticLockError("Agendamento foi modificado por outro processo")
-
-        # 7. Replace junction table records
-        self.db.execute_write(
-            "DELETE FROM scheduler.appointment_service_areas WHERE appointment_id = %s::uuid",
-            (appointment_id,),
-        )
-        self.db.execute_write(
-            "DELETE FROM scheduler.appointment_services WHERE appointment_id = %s::uuid",
-            (appointment_id,),
-        )
-
+        # 6. Update appointment and junction rows in a single statement.
+        # Every write hangs off the optimistic-lock UPDATE (upd), so a
+        # version mismatch leaves the junction tables untouched. Junction rows
+        # are upserted and stale pairs pruned instead of delete-and-reinsert.
         if service_area_pairs:
-            values_clause = ", ".join(["(%s::uuid, %s::uuid)"] * len(service_area_pairs))
-            params = ()
-            for pair in service_area_pairs:
-                params += (pair["serviceId"], pair["areaId"])
-            pair_rows = self.db.execute_query(
-                f"""SELECT pairs.service_id, pairs.area_id,
-                       s.name as service_name, a.name as area_name,
-                       COALESCE(sa.duration_minutes, s.duration_minutes) as duration_minutes,
-                       COALESCE(sa.price_cents, s.price_cents) as price_cents
-                FROM (VALUES {values_clause}) AS pairs(service_id, area_id)
-                JOIN scheduler.services s ON s.id = pairs.service_id
-                JOIN scheduler.areas a ON a.id = pairs.area_id
-                LEFT JOIN scheduler.service_areas sa ON sa.service_id = pairs.service_id AND sa.area_id = pairs.area_id AND sa.active = TRUE""",
-                params,
-            )
-            for row in pair_rows:
-                self.db.execute_write(
-                    """
+            query = """
+                WITH upd AS (
+                    UPDATE scheduler.appointments
+                    SET service_id = %s::uuid, end_time = %s::time, total_duration_minutes = %s,
+                        original_price_cents = %s, final_price_cents = %s,
+                        version = version + 1, updated_at = NOW()
+                    WHERE id = %s::uuid AND version = %s
+                    RETURNING *
+                ),
+                pairs AS (
+                    SELECT DISTINCT * FROM unnest(%s::uuid[], %s::uuid[]) AS p(service_id, area_id)
+                ),
+                ins AS (
                     INSERT INTO scheduler.appointment_service_areas
                         (appointment_id, service_id, area_id, area_name, service_name, duration_minutes, price_cents)
-                    VALUES (%s::uuid, %s::uuid, %s::uuid, %s, %s, %s, %s)
-                    """,
-                    (appointment_id, str(row["service_id"]), str(row["area_id"]),
-                     row["area_name"], row["service_name"],
-                     row["duration_minutes"], row.get("price_cents")),
+                    SELECT upd.id, pairs.service_id, pairs.area_id, a.name, s.name,
+                           COALESCE(sa.duration_minutes, s.duration_minutes),
+                           COALESCE(sa.price_cents, s.price_cents)
+                    FROM upd
+                    CROSS JOIN pairs
+                    JOIN scheduler.services s ON s.id = pairs.service_id
+                    JOIN scheduler.areas a ON a.id = pairs.area_id
+                    LEFT JOIN scheduler.service_areas sa ON sa.service_id = pairs.service_id AND sa.area_id = pairs.area_id AND sa.active = TRUE
+                    ON CONFLICT (appointment_id, service_id, area_id) DO UPDATE
+                    SET area_name = EXCLUDED.area_name,
+                        service_name = EXCLUDED.service_name,
+                        duration_minutes = EXCLUDED.duration_minutes,
+                        price_cents = EXCLUDED.price_cents
+                    RETURNING 1
+                ),
+                del_areas AS (
+                    DELETE FROM scheduler.appointment_service_areas
+                    WHERE appointment_id IN (SELECT id FROM upd)
+                    AND (service_id, area_id) NOT IN (SELECT service_id, area_id FROM pairs)
+                    RETURNING 1
+                ),
+                del_services AS (
+                    DELETE FROM scheduler.appointment_services
+                    WHERE appointment_id IN (SELECT id FROM upd)
+                    RETURNING 1
                 )
+                SELECT * FROM upd
+            """
+            params = (
+                service_id, new_end_time, duration_minutes, original_price_cents, final_price_cents,
+                appointment_id, current_version,
+                [pair["serviceId"] for pair in service_area_pairs],
+                [pair["areaId"] for pair in service_area_pairs],
+            )
         else:
-            self.db.execute_write(
-                """
-                INSERT INTO scheduler.appointment_services
-                    (appointment_id, service_id, service_name, duration_minutes, price_cents)
-                VALUES (%s::uuid, %s::uuid, %s, %s, %s)
-                """,
-                (appointment_id, service_id, svc["name"], svc["duration_minutes"], svc.get("price_cents")),
+            query = """
+                WITH upd AS (
+                    UPDATE scheduler.appointments
+                    SET service_id = %s::uuid, end_time = %s::time, total_duration_minutes = %s,
+                        original_price_cents = %s, final_price_cents = %s,
+                        version = version + 1, updated_at = NOW()
+                    WHERE id = %s::uuid AND version = %s
+                    RETURNING *
+                ),
+                del_areas AS (
+                    DELETE FROM scheduler.appointment_service_areas
+                    WHERE appointment_id IN (SELECT id FROM upd)
+                    RETURNING 1
+                ),
+                ins AS (
+                    INSERT INTO scheduler.appointment_services
+                        (appointment_id, service_id, service_name, duration_minutes, price_cents)
+                    SELECT upd.id, %s::uuid, %s, %s, %s FROM upd
+                    ON CONFLICT (appointment_id, service_id) DO UPDATE
+                    SET service_name = EXCLUDED.service_name,
+                        duration_minutes = EXCLUDED.duration_minutes,
+                        price_cents = EXCLUDED.price_cents
+                    RETURNING 1
+                ),
+                del_services AS (
+                    DELETE FROM scheduler.appointment_services
+                    WHERE appointment_id IN (SELECT id FROM upd) AND service_id != %s::uuid
+                    RETURNING 1
+                )
+                SELECT * FROM upd
+            """
+            params = (
+                service_id, new_end_time, duration_minutes, original_price_cents, final_price_cents,
+                appointment_id, current_version,
+                service_id, svc["name"], svc["duration_minutes"], svc.get("price_cents"),
+                service_id,
             )
 
-        # 8. Re-fetch and sync
-        result = self.db.execute_query(
-            "SELECT * FROM scheduler.appointments WHERE id = %s::uuid",
-            (appointment_id,),
-        )
-        updated_appointment = result[0] if result else appointment
+        try:
+            updated_appointment = self.db.execute_write_returning(query, params)
+        except ExclusionViolation:
+            raise ConflictError(f"Conflito de horário com nova duração: {appt_date} {start_time}-{new_end_time}")
+        if not updated_appointment:
+            raise OptimisticLockError("Agendamento foi modificado por outro processo")
 
         logger.info(
             f"[AppointmentService] Serviço/áreas atualizados: id={appointment_id} "
@@ -528,33 +556,25 @@ class AppointmentService:
     def get_active_appointment_by_phone(
         self, clinic_id: str, phone: str
     ) -> Optional[Dict[str, Any]]:
-        patients = self.db.execute_query(
-            "SELECT id FROM scheduler.patients WHERE clinic_id = %s AND phone = %s AND deleted_at IS NULL",
-            (clinic_id, phone),
-        )
-
-        if not patients:
-            return None
-
-        patient_id = str(patients[0]["id"])
-
         appointments = self.db.execute_query(
             """
             SELECT a.*, s.name as service_name,
                    areas_q.areas_display
-            FROM scheduler.appointments a
+            FROM scheduler.patients p
+            JOIN scheduler.appointments a ON a.patient_id = p.id
             LEFT JOIN scheduler.services s ON a.service_id = s.id
             LEFT JOIN LATERAL (
                 SELECT string_agg(asa.area_name, ', ' ORDER BY asa.created_at) as areas_display
                 FROM scheduler.appointment_service_areas asa
                 WHERE asa.appointment_id = a.id
             ) areas_q ON TRUE
-            WHERE a.patient_id = %s::uuid AND a.status = 'CONFIRMED'
+            WHERE p.clinic_id = %s AND p.phone = %s AND p.deleted_at IS NULL
+            AND a.status = 'CONFIRMED'
             AND a.appointment_date >= CURRENT_DATE
             ORDER BY a.appointment_date ASC, a.start_time ASC
             LIMIT 1
             """,
-            (patient_id,),
+            (clinic_id, phone),
         )
 
         return appointments[0] if appointments else None
@@ -562,74 +582,44 @@ class AppointmentService:
     def get_active_appointments_by_phone(
         self, clinic_id: str, phone: str
     ) -> List[Dict[str, Any]]:
-        patients = self.db.execute_query(
-            "SELECT id FROM scheduler.patients WHERE clinic_id = %s AND phone = %s AND deleted_at IS NULL",
-            (clinic_id, phone),
-        )
-
-        if not patients:
-            return []
-
-        patient_id = str(patients[0]["id"])
-
+        # Only the columns the lookup flows read: these rows are also cached in
+        # the DynamoDB session, so every extra column is paid for twice
         appointments = self.db.execute_query(
             """
-            SELECT a.*, s.name as service_name,
+            SELECT a.id, a.clinic_id, a.service_id, a.appointment_date, a.start_time, a.end_time,
+                   a.status, a.full_name, s.name as service_name,
                    areas_q.areas_display
-            FROM scheduler.appointments a
+            FROM scheduler.patients p
+            JOIN scheduler.appointments a ON a.patient_id = p.id
             LEFT JOIN scheduler.services s ON a.service_id = s.id
             LEFT JOIN LATERAL (
                 SELECT string_agg(asa.area_name, ', ' ORDER BY asa.created_at) as areas_display
                 FROM scheduler.appointment_service_areas asa
                 WHERE asa.appointment_id = a.id
             ) areas_q ON TRUE
-            WHERE a.patient_id = %s::uuid AND a.status = 'CONFIRMED'
+            WHERE p.clinic_id = %s AND p.phone = %s AND p.deleted_at IS NULL
+            AND a.status = 'CONFIRMED'
             AND a.appointment_date >= CURRENT_DATE
             ORDER BY a.appointment_date ASC, a.start_time ASC
             """,
-            (patient_id,),
-        )
-
-        return appointments
-
-    def _get_or_create_patient(self, clinic_id: str, phone: str) -> Dict[str, Any]:
-        from src.utils.phone import normalize_phone
-        phone = normalize_phone(phone)
-
-        # Lookup includes soft-deleted records so we can restore in place
-        # and avoid violating the UNIQUE(clinic_id, phone) constraint.
-        patients = self.db.execute_query(
-            "SELECT * FROM scheduler.patients WHERE clinic_id = %s AND phone = %s",
             (clinic_id, phone),
         )
 
-        if patients:
-            existing = patients[0]
-            if existing.get("deleted_at") is None:
-                return existing
+        return appointments
 
-            # Soft-deleted patient came back — restore in place
-            restored = self.db.execute_write_returning(
-                """
-                UPDATE scheduler.patients
-                SET deleted_at = NULL, updated_at = NOW()
-                WHERE id = %s::uuid
-                RETURNING *
-                """,
-                (str(existing["id"]),),
-            )
-            logger.info(
-                f"[AppointmentService] Patient restored from soft-delete: id={existing['id']} phone={phone}"
-            )
-            return restored
+    def _get_default_professional_id(self, clinic_id: str) -> Optional[str]:
+        now = monotonic()
+        cached = _default_professional_cache.get(clinic_id)
+        if cached and cached[0] > now:
+            return cached[1]
 
-        result = self.db.execute_write_returning(
-            """
-            INSERT INTO scheduler.patients (clinic_id, phone, created_at, updated_at)
-            VALUES (%s, %s, NOW(), NOW())
-            RETURNING *
-            """,
-            (clinic_id, phone),
+        professional_id = self.db.execute_scalar(
+            "SELECT id FROM scheduler.professionals WHERE clinic_id = %s AND active = TRUE LIMIT 1",
+            (clinic_id,),
         )
+        if not professional_id:
+            return None
 
-        return result
+        professional_id = str(professional_id)
+        _default_professional_cache[clinic_id] = (now + DEFAULT_PROFESSIONAL_CACHE_TTL_SECONDS, professional_id)
+        return professional_id
@@ -1,11 +1,48 @@
 import logging
-from datetime import datetime, date, time, timedelta
-from typing import List, Optional
+from bisect import bisect_right
+from time import monotonic
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional
 
 from src.services.db.postgres import PostgresService
 
 logger = logging.getLogger(__name__)
 
+MAX_SEARCH_DAYS = 90
+CONFIG_CACHE_TTL_SECONDS = 300
+
+# service_id -> (expires_at, duration_minutes) and
+# clinic_id -> (expires_at, (buffer_minutes, max_future_dates)); reused across
+# warm invocations. Service and clinic CRUD run in other Lambdas, so staleness
+# is bounded by the TTL.
+_service_duration_cache: Dict[str, tuple] = {}
+_clinic_config_cache: Dict[str, tuple] = {}
+
+# Rules (recurring plus fixed-date ones inside the range), exceptions and confirmed
+# appointments for a clinic and date range, tagged by source, with times already
+# as minutes since midnight (driver returns ints, not time objects). Runs on every
+# availability lookup, so it is a server-side prepared statement.
+_Q_AVAILABILITY_ROWS = """
+    SELECT 'rule' AS kind, rule_date AS day, day_of_week, NULL AS exception_type,
+           EXTRACT(HOUR FROM start_time)::int * 60 + EXTRACT(MINUTE FROM start_time)::int AS start_minute,
+           EXTRACT(HOUR FROM end_time)::int * 60 + EXTRACT(MINUTE FROM end_time)::int AS end_minute
+    FROM scheduler.availability_rules
+    WHERE clinic_id = $1 AND active = TRUE
+      AND (rule_date IS NULL OR rule_date BETWEEN $2::date AND $3::date)
+    UNION ALL
+    SELECT 'exception', exception_date, NULL, exception_type,
+           COALESCE(EXTRACT(HOUR FROM start_time)::int * 60 + EXTRACT(MINUTE FROM start_time)::int, 0),
+           COALESCE(EXTRACT(HOUR FROM end_time)::int * 60 + EXTRACT(MINUTE FROM end_time)::int, 0)
+    FROM scheduler.availability_exceptions
+    WHERE clinic_id = $1 AND exception_date BETWEEN $2::date AND $3::date
+    UNION ALL
+    SELECT 'appointment', appointment_date, NULL, NULL,
+           EXTRACT(HOUR FROM start_time)::int * 60 + EXTRACT(MINUTE FROM start_time)::int,
+           EXTRACT(HOUR FROM end_time)::int * 60 + EXTRACT(MINUTE FROM end_time)::int
+    FROM scheduler.appointments
+    WHERE clinic_id = $1 AND appointment_date BETWEEN $2::date AND $3::date AND status = 'CONFIRMED'
+"""
+
 
 class AvailabilityEngine:
 
@@ -15,212 +52,157 @@ class AvailabilityEngine:
     def get_available_slots(self, clinic_id: str, target_date: str, service_id: str) -> List[str]:
         try:
             # 1. Fetch service duration
-            services = self.db.execute_query(
-                "SELECT duration_minutes FROM scheduler.services WHERE id = %s::uuid AND active = TRUE",
-                (service_id,),
-            )
-            if not services:
-                logger.warning(f"[AvailabilityEngine] Servico {service_id} nao encontrado")
-                return []
-            duration_minutes = services[0]["duration_minutes"]
-
-            # 2. Fetch clinic buffer
-            clinics = self.db.execute_query(
-                "SELECT buffer_minutes FROM scheduler.clinics WHERE clinic_id = %s AND active = TRUE",
-                (clinic_id,),
-            )
-            buffer_minutes = clinics[0]["buffer_minutes"] if clinics else 10
-
-            # 3. Parse date and get day_of_week (DB stores 0=Sunday, 1=Monday, ..., 6=Saturday)
-            dt = datetime.strptime(target_date, "%Y-%m-%d").date()
-            day_of_week = dt.isoweekday() % 7  # 0=Sunday, 1=Monday, ..., 6=Saturday
-
-            # 4. Fetch availability rules for this day (recurring + fixed-date)
-            rules = self.db.execute_query(
-                """
-                SELECT start_time, end_time, rule_date FROM scheduler.availability_rules
-                WHERE clinic_id = %s AND active = TRUE
-                  AND (day_of_week = %s OR rule_date = %s)
-                """,
-                (clinic_id, day_of_week, target_date),
-            )
-            if not rules:
+            duration_minutes = self._get_service_duration(service_id)
+            if duration_minutes is None:
+                logger.warning("[AvailabilityEngine] Servico %s nao encontrado", service_id)
                 return []
 
-            # Fixed-date rules take priority over recurring day_of_week rules
-            fixed_rules = [r for r in rules if r.get("rule_date")]
-            if fixed_rules:
-                rules = fixed_rules
-
-            # 5. Check availability exceptions
-            exceptions = self.db.execute_query(
-                """
-                SELECT exception_type, start_time, end_time FROM scheduler.availability_exceptions
-                WHERE clinic_id = %s AND exception_date = %s
-                """,
-                (clinic_id, target_date),
-            )
-
-            for exc in exceptions:
-                if exc["exception_type"] == "BLOCKED":
-                    return []
-                elif exc["exception_type"] == "SPECIAL_HOURS":
-                    rules = [{"start_time": exc["start_time"], "end_time": exc["end_time"]}]
-
-            # 6. Fetch existing confirmed appointments for this date
-            appointments = self.db.execute_query(
-                """
-                SELECT start_time, end_time FROM scheduler.appointments
-                WHERE clinic_id = %s AND appointment_date = %s AND status = 'CONFIRMED'
-                """,
-                (clinic_id, target_date),
-            )
-
-            # 7. Calculate free windows and generate slots in gaps
-            free_windows = self._calculate_free_windows(rules, appointments, buffer_minutes)
-            slot_minutes = self._generate_slots_in_windows(free_windows, duration_minutes, buffer_minutes)
-
+            # 2. Load rules, exceptions and appointments for the date and compute slots
+            dt = _parse_iso_date(target_date)
+            _, slot_minutes = next(self._iter_day_slots(clinic_id, dt, dt, duration_minutes))
             return [_minutes_to_time_str(s) for s in slot_minutes]
 
         except Exception as e:
-            logger.error(f"[AvailabilityEngine] Erro ao calcular slots: {e}")
+            logger.error("[AvailabilityEngine] Erro ao calcular slots: %s", e)
             return []
 
     def get_available_days(self, clinic_id: str, service_id: str, max_dates: Optional[int] = None) -> List[str]:
         try:
-            if max_dates is None:
-                max_dates = self._get_max_future_dates(clinic_id)
-
-            today = date.today()
-            available_days = []
-            max_search = 90
-
-            for i in range(1, max_search + 1):
-                if len(available_days) >= max_dates:
-                    break
-                target = today + timedelta(days=i)
-                target_str = target.strftime("%Y-%m-%d")
-                slots = self.get_available_slots(clinic_id, target_str, service_id)
-                if slots:
-                    available_days.append(target_str)
-
-            return available_days
+            duration_minutes = self._get_service_duration(service_id)
+            if duration_minutes is None:
+                logger.warning("[AvailabilityEngine] Servico %s nao encontrado", service_id)
+                return []
+            return self._find_available_days(clinic_id, duration_minutes, max_dates)
 
         except Exception as e:
-            logger.error(f"[AvailabilityEngine] Erro ao buscar dias disponiveis: {e}")
+            logger.error("[AvailabilityEngine] Erro ao buscar dias disponiveis: %s", e)
             return []
 
     def get_available_slots_multi(self, clinic_id: str, target_date: str, total_duration: int) -> List[str]:
         """Calculate available slots using a direct duration value (sum of selected services)."""
         try:
-            # 1. Fetch clinic buffer
-            clinics = self.db.execute_query(
-                "SELECT buffer_minutes FROM scheduler.clinics WHERE clinic_id = %s AND active = TRUE",
-                (clinic_id,),
-            )
-            buffer_minutes = clinics[0]["buffer_minutes"] if clinics else 10
-
-            # 2. Parse date and get day_of_week
-            dt = datetime.strptime(target_date, "%Y-%m-%d").date()
-            day_of_week = dt.isoweekday() % 7
-
-            # 3. Fetch availability rules for this day (recurring + fixed-date)
-            rules = self.db.execute_query(
-                """
-                SELECT start_time, end_time, rule_date FROM scheduler.availability_rules
-                WHERE clinic_id = %s AND active = TRUE
-                  AND (day_of_week = %s OR rule_date = %s)
-                """,
-                (clinic_id, day_of_week, target_date),
-            )
-            if not rules:
-                return []
-
-            # Fixed-date rules take priority over recurring day_of_week rules
-            fixed_rules = [r for r in rules if r.get("rule_date")]
-            if fixed_rules:
-                rules = fixed_rules
-
-            # 4. Check availability exceptions
-            exceptions = self.db.execute_query(
-                """
-                SELECT exception_type, start_time, end_time FROM scheduler.availability_exceptions
-                WHERE clinic_id = %s AND exception_date = %s
-                """,
-                (clinic_id, target_date),
-            )
-
-            for exc in exceptions:
-                if exc["exception_type"] == "BLOCKED":
-                    return []
-                elif exc["exception_type"] == "SPECIAL_HOURS":
-                    rules = [{"start_time": exc["start_time"], "end_time": exc["end_time"]}]
-
-            # 5. Fetch existing confirmed appointments for this date
-            appointments = self.db.execute_query(
-                """
-                SELECT start_time, end_time FROM scheduler.appointments
-                WHERE clinic_id = %s AND appointment_date = %s AND status = 'CONFIRMED'
-                """,
-                (clinic_id, target_date),
-            )
-
-            # 6. Calculate free windows and generate slots in gaps
-            free_windows = self._calculate_free_windows(rules, appointments, buffer_minutes)
-            slot_minutes = self._generate_slots_in_windows(free_windows, total_duration, buffer_minutes)
-
+            dt = _parse_iso_date(target_date)
+            _, slot_minutes = next(self._iter_day_slots(clinic_id, dt, dt, total_duration))
             return [_minutes_to_time_str(s) for s in slot_minutes]
 
         except Exception as e:
-            logger.error(f"[AvailabilityEngine] Erro ao calcular slots multi: {e}")
+            logger.error("[AvailabilityEngine] Erro ao calcular slots multi: %s", e)
             return []
 
     def get_available_days_multi(self, clinic_id: str, total_duration: int, max_dates: Optional[int] = None) -> List[str]:
         """Find available days using a direct duration value (sum of selected services)."""
         try:
-            if max_dates is None:
-                max_dates = self._get_max_future_dates(clinic_id)
-
-            today = date.today()
-            available_days = []
-            max_search = 90
-
-            for i in range(1, max_search + 1):
-                if len(available_days) >= max_dates:
-                    break
-                target = today + timedelta(days=i)
-                target_str = target.strftime("%Y-%m-%d")
-                slots = self.get_available_slots_multi(clinic_id, target_str, total_duration)
-                if slots:
-                    available_days.append(target_str)
-
-            return available_days
+            return self._find_available_days(clinic_id, total_duration, max_dates)
 
         except Exception as e:
-            logger.error(f"[AvailabilityEngine] Erro ao buscar dias disponiveis multi: {e}")
+            logger.error("[AvailabilityEngine] Erro ao buscar dias disponiveis multi: %s", e)
             return []
 
+    def _find_available_days(self, clinic_id: str, duration_minutes: int, max_dates: Optional[int]) -> List[str]:
+        if max_dates is None:
+            max_dates = self._get_max_future_dates(clinic_id)
+
+        # The whole search range is loaded once, not one set of queries per day
+        today = date.today()
+        date_from = today + timedelta(days=1)
+        date_to = today + timedelta(days=MAX_SEARCH_DAYS)
+
+        # Days are computed lazily in date order: stop as soon as enough are found
+        available_days = []
+        for target, slots in self._iter_day_slots(clinic_id, date_from, date_to, duration_minutes):
+            if len(available_days) >= max_dates:
+                break
+            if slots:
+                available_days.append(target.isoformat())
+
+        return available_days
+
+    def _iter_day_slots(self, clinic_id: str, date_from: date, date_to: date, duration: int) -> Iterator[tuple]:
+        """Yield (date, slot start minutes) for each date in [date_from, date_to], from one load."""
+        (
+            buffer_minutes, weekly_windows, fixed_windows, closed_dates, special_windows, blocked_by_date,
+        ) = self._bulk_load(clinic_id, date_from, date_to)
+
+        for ordinal in range(date_from.toordinal(), date_to.toordinal() + 1):
+            current = date.fromordinal(ordinal)
+            day_of_week = ordinal % 7  # ordinal 1 is a Monday: 0=Sunday, 1=Monday, ..., 6=Saturday
+            # Fixed-date rules take priority over recurring day_of_week rules
+            windows = fixed_windows.get(current) or weekly_windows.get(day_of_week)
+            if not windows or current in closed_dates:
+                # Closed or BLOCKED day: nothing to subtract or generate
+                yield current, []
+                continue
+            # SPECIAL_HOURS windows replace the day's rule windows
+            windows = special_windows.get(current, windows)
+            yield current, self._compute_slots(windows, blocked_by_date.get(current, []), duration, buffer_minutes)
+
+    def _bulk_load(self, clinic_id: str, date_from: date, date_to: date) -> tuple:
+        """
+        Fetch clinic buffer, rules, exceptions and confirmed appointments for a date range.
+
+        Times arrive as minutes from the query, so the per-day computation
+        only handles integer intervals: rule windows bucketed by
+        day_of_week and by rule_date, and appointments as sorted, merged
+        blocked intervals (buffer included) by date. Exceptions are resolved
+        here too, into BLOCKED dates and SPECIAL_HOURS windows by date, so
+        the per-day path never compares exception types.
+        """
+        buffer_minutes = self._get_clinic_config(clinic_id)[0]
+
+        # Rules, exceptions and confirmed appointments in a single round-trip
+        rows = self.db.execute_prepared(
+            "q_availability_rows", _Q_AVAILABILITY_ROWS, (clinic_id, date_from, date_to),
+        )
+
+        weekly_windows = {}
+        fixed_windows = {}
+        closed_dates = set()
+        special_windows = {}
+        intervals_by_date = {}
+        for row in rows:
+            row_start = row["start_minute"]
+            row_end = row["end_minute"]
+            kind = row["kind"]
+            if kind == "appointment":
+                intervals_by_date.setdefault(row["day"], []).append(
+                    (max(0, row_start - buffer_minutes), row_end + buffer_minutes)
+                )
+            elif kind == "exception":
+                exception_type = row["exception_type"]
+                if exception_type == "BLOCKED":
+                    closed_dates.add(row["day"])
+                elif exception_type == "SPECIAL_HOURS":
+                    special_windows.setdefault(row["day"], []).append((row_start, row_end))
+            elif row["day"]:
+                fixed_windows.setdefault(row["day"], []).append((row_start, row_end))
+            else:
+                weekly_windows.setdefault(row["day_of_week"], []).append((row_start, row_end))
+
+        blocked_by_date = {day: _merge_intervals(intervals) for day, intervals in intervals_by_date.items()}
+        # Several SPECIAL_HOURS on one date all apply (previously the last row won)
+        special_windows = {day: _merge_intervals(windows) for day, windows in special_windows.items()}
+
+        return buffer_minutes, weekly_windows, fixed_windows, closed_dates, special_windows, blocked_by_date
+
+    @classmethod
+    def _compute_slots(cls, windows: list, blocked: list, duration: int, buffer: int) -> List[int]:
+        """Slot start minutes for one open day, given its effective windows and blocked intervals."""
+        free_windows = cls._calculate_free_windows(windows, blocked)
+        return cls._generate_slots_in_windows(free_windows, duration, buffer)
+
     @staticmethod
-    def _calculate_free_windows(rules: list, appointments: list, buffer_minutes: int) -> List[tuple]:
-        """Calculate free time windows by subtracting appointments (with buffer) from rules."""
-        # Build sorted list of blocked intervals from appointments
-        blocked = []
-        for appt in appointments:
-            appt_start = _time_to_minutes(appt["start_time"])
-            appt_end = _time_to_minutes(appt["end_time"])
-            blocked.append((max(0, appt_start - buffer_minutes), appt_end + buffer_minutes))
-        blocked.sort()
+    def _calculate_free_windows(windows: list, blocked: list) -> List[tuple]:
+        """Calculate free time windows by subtracting sorted, disjoint blocked intervals from rule windows."""
+        # Disjoint and sorted, so ends are sorted too: bisect to the first block
+        # ending after the rule starts instead of scanning from the beginning
+        block_ends = [block_end for _, block_end in blocked]
 
         free_windows = []
-        for rule in rules:
-            rule_start = _time_to_minutes(rule["start_time"])
-            rule_end = _time_to_minutes(rule["end_time"])
-
+        for rule_start, rule_end in windows:
             # Subtract each blocked interval from the rule window
             current_start = rule_start
-            for block_start, block_end in blocked:
-                if block_end <= current_start:
-                    continue
+            for i in range(bisect_right(block_ends, rule_start), len(blocked)):
+                block_start, block_end = blocked[i]
                 if block_start >= rule_end:
                     break
                 # There's a free gap before this blocked interval
@@ -238,31 +220,68 @@ class AvailabilityEngine:
     def _generate_slots_in_windows(free_windows: list, duration: int, buffer: int) -> List[int]:
         """Generate slot start times within each free window."""
         slots = []
+        step = duration + buffer
         for window_start, window_end in free_windows:
-            current = window_start
-            while current + duration <= window_end:
-                slots.append(current)
-                current += duration + buffer
+            slots.extend(range(window_start, window_end - duration + 1, step))
         return slots
 
-    def _get_max_future_dates(self, clinic_id: str) -> int:
-        clinic = self.db.execute_query(
-            "SELECT max_future_dates FROM scheduler.clinics WHERE clinic_id = %s",
+    def _get_service_duration(self, service_id: str) -> Optional[int]:
+        now = monotonic()
+        cached = _service_duration_cache.get(service_id)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        duration_minutes = self.db.execute_scalar(
+            "SELECT duration_minutes FROM scheduler.services WHERE id = %s::uuid AND active = TRUE",
+            (service_id,),
+        )
+        if duration_minutes is None:
+            return None
+
+        _service_duration_cache[service_id] = (now + CONFIG_CACHE_TTL_SECONDS, duration_minutes)
+        return duration_minutes
+
+    def _get_clinic_config(self, clinic_id: str) -> tuple:
+        """(buffer_minutes, max_future_dates) for the clinic, with the engine defaults."""
+        now = monotonic()
+        cached = _clinic_config_cache.get(clinic_id)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        clinics = self.db.execute_query(
+            "SELECT buffer_minutes, max_future_dates, active FROM scheduler.clinics WHERE clinic_id = %s",
             (clinic_id,),
         )
-        return (clinic[0].get("max_future_dates") or 5) if clinic else 5
-
-
-def _time_to_minutes(t) -> int:
-    if isinstance(t, time):
-        return t.hour * 60 + t.minute
-    elif isinstance(t, timedelta):
-        total_seconds = int(t.total_seconds())
-        return total_seconds // 60
-    elif isinstance(t, str):
-        parts = t.split(":")
-        return int(parts[0]) * 60 + int(parts[1])
-    return 0
+        if not clinics:
+            return 10, 5
+
+        clinic = clinics[0]
+        config = (
+            clinic["buffer_minutes"] if clinic["active"] else 10,
+            clinic.get("max_future_dates") or 5,
+        )
+        _clinic_config_cache[clinic_id] = (now + CONFIG_CACHE_TTL_SECONDS, config)
+        return config
+
+    def _get_max_future_dates(self, clinic_id: str) -> int:
+        return self._get_clinic_config(clinic_id)[1]
+
+
+def _merge_intervals(intervals: list) -> List[tuple]:
+    """Sort intervals and merge overlapping/touching ones into disjoint blocks."""
+    merged = []
+    for block_start, block_end in sorted(intervals):
+        if merged and block_start <= merged[-1][1]:
+            if block_end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], block_end)
+        else:
+            merged.append((block_start, block_end))
+    return merged
+
+
+def _parse_iso_date(value: str) -> date:
+    # Fixed YYYY-MM-DD layout: slicing is much cheaper than strptime
+    return date(int(value[0:4]), int(value[5:7]), int(value[8:10]))
 
 
 def _minutes_to_time_str(minutes: int) -> str:
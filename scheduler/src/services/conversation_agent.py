@@ -10,6 +10,7 @@ import boto3
 
 from src.services.anthropic_service import AnthropicService, AnthropicError
 from src.services.ai_tools import ToolExecutor, get_tool_definitions
+from src.services.conversation_engine import SESSION_TTL_SECONDS
 from src.services.template_service import TemplateService
 
 logger = logging.getLogger(__name__)
@@ -44,7 +45,7 @@ class ConversationAgent:
     """
 
     def __init__(self, db, template_service, availability_engine,
-                 appointment_service, provider, message_tracker):
+                 appointment_service, provider, message_tracker, sessions_table=None):
         self.db = db
         self.template_service = template_service
         self.provider = provider
@@ -52,8 +53,9 @@ class ConversationAgent:
         self.anthropic = AnthropicService()
         self.tool_executor = ToolExecutor(db, availability_engine, appointment_service)
 
-        dynamodb = boto3.resource("dynamodb")
-        self.sessions_table = dynamodb.Table(os.environ["CONVERSATION_SESSIONS_TABLE"])
+        if sessions_table is None:
+            sessions_table = boto3.resource("dynamodb").Table(os.environ["CONVERSATION_SESSIONS_TABLE"])
+        self.sessions_table = sessions_table
 
     def process_message(self, clinic_id, incoming):
         """
@@ -369,6 +371,7 @@ class ConversationAgent:
                     "clinicId": clinic_id,
                     "phone": phone,
                     "updatedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now)),
+                    "ttl": now + SESSION_TTL_SECONDS,
                 }
             )
         except Exception as e:
@@ -7,7 +7,8 @@ from datetime import date, datetime, time as dt_time, timedelta
 from decimal import Decimal
 from enum import Enum
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
 import boto3
 from boto3.dynamodb.conditions import Key
@@ -19,6 +20,39 @@ from src.providers.whatsapp_provider import IncomingMessage, WhatsAppProvider
 
 logger = logging.getLogger(__name__)
 
+# DynamoDB TTL on the sessions table: idle conversations expire 48h after the last write
+SESSION_TTL_SECONDS = 48 * 60 * 60
+
+CATALOG_CACHE_TTL_SECONDS = 300
+
+# Reused across warm invocations: clinic and service rows change on the order of hours,
+# and the engine is rebuilt per message, so these live at module scope
+_clinic_cache: Dict[str, tuple] = {}
+_service_cache: Dict[str, tuple] = {}
+_price_table_cache: Dict[str, tuple] = {}
+
+# Global commands recognized at any step, mapped to the input they stand for.
+# Built back-last so "back" wins should a word ever land in more than one group.
+_GLOBAL_COMMANDS: Dict[str, str] = {
+    **dict.fromkeys((
+        "humano", "atendente", "pessoa", "ajuda", "suporte",
+        "falar com atendente", "falar com alguem", "falar com alguém",
+        "atendente humano", "falar com humano",
+    ), "human"),
+    **dict.fromkeys((
+        "menu", "menu principal", "inicio", "início",
+        "recomeçar", "recomecar", "reiniciar", "começo", "comeco",
+        "oi", "ola", "olá", "hi", "hello",
+    ), "main_menu"),
+    **dict.fromkeys((
+        "voltar", "volta", "back", "anterior", "retornar", "0",
+    ), "back"),
+}
+
+# Synonyms for confirm/back intents, resolved against the current buttons
+_CONFIRM_SYNONYMS = frozenset({"sim", "s", "ok", "confirmar", "confirmo", "pode", "isso", "certo", "bora"})
+_BACK_SYNONYMS = frozenset({"nao", "não", "n", "cancelar"})
+
 class ConversationState(str, Enum):
     WELCOME = "WELCOME"
     MAIN_MENU = "MAIN_MENU"
@@ -62,8 +96,18 @@ class OutgoingMessage:
     button_text: Optional[str] = None
 
 
+@dataclass(frozen=True)
+class StateConfig:
+    template_key: Optional[str] = None
+    buttons: Tuple[Dict[str, str], ...] = ()
+    transitions: Mapping[str, ConversationState] = field(default_factory=lambda: MappingProxyType({}))
+    fallback: ConversationState = ConversationState.UNRECOGNIZED
+    previous: Optional[ConversationState] = None
+    input_type: Optional[str] = None
+
+
 # State machine configuration
-STATE_CONFIG = {
+_STATE_SPECS = {
     ConversationState.MAIN_MENU: {
         "template_key": "MAIN_MENU",
         "buttons": [
@@ -350,6 +394,17 @@ STATE_CONFIG = {
     },
 }
 
+# Frozen once at import; states without a spec (e.g. WELCOME) use the defaults
+STATE_CONFIG: Dict[ConversationState, StateConfig] = {
+    state: StateConfig(**{
+        **spec,
+        "buttons": tuple(spec.get("buttons", ())),
+        "transitions": MappingProxyType(dict(spec.get("transitions", {}))),
+    })
+    for state, spec in _STATE_SPECS.items()
+}
+_DEFAULT_STATE_CONFIG = StateConfig()
+
 
 FLOW_SESSION_KEYS = [
     "selected_service_ids", "selected_services_display", "total_duration_minutes", "total_price_cents",
@@ -380,6 +435,7 @@ class ConversationEngine:
         provider: WhatsAppProvider,
         message_tracker: MessageTracker,
         intent_classifier=None,
+        sessions_table=None,
     ):
         self.db = db
         self.template_service = template_service
@@ -389,8 +445,9 @@ class ConversationEngine:
         self.message_tracker = message_tracker
         self.intent_classifier = intent_classifier
 
-        dynamodb = boto3.resource("dynamodb")
-        self.sessions_table = dynamodb.Table(os.environ["CONVERSATION_SESSIONS_TABLE"])
+        if sessions_table is None:
+            sessions_table = boto3.resource("dynamodb").Table(os.environ["CONVERSATION_SESSIONS_TABLE"])
+        self.sessions_table = sessions_table
 
     def process_message(self, clinic_id: str, incoming: IncomingMessage) -> List[OutgoingMessage]:
         phone = incoming.phone
@@ -404,7 +461,8 @@ class ConversationEngine:
             f"currentState={current_state} | content='{incoming.content[:50]}'"
         )
 
-        # 1.5 Check if human attendant mode is active
+        # 1.5 Check if human attendant mode is active. Leaving it only mutates the
+        # session; the single put at the end of the turn persists the reset.
         HANDOFF_TTL_SECONDS = 24 * 60 * 60  # 24h
         if current_state in (ConversationState.HUMAN_ATTENDANT_ACTIVE, ConversationState.HUMAN_HANDOFF):
             # Allow "Retomar atendimento" button to reactivate bot from HUMAN_HANDOFF
@@ -412,7 +470,6 @@ class ConversationEngine:
                 logger.info(f"[ConversationEngine] Paciente clicou 'Retomar atendimento', reativando bot para {phone}")
                 session.pop("human_handoff_requested_at", None)
                 session["state"] = ConversationState.WELCOME.value
-                self._save_session(clinic_id, phone, session)
                 current_state = ConversationState.WELCOME
             else:
                 # Check TTL: attendant_active_until for HUMAN_ATTENDANT_ACTIVE,
@@ -433,7 +490,6 @@ class ConversationEngine:
                     session.pop("attendant_active_until", None)
                     session.pop("human_handoff_requested_at", None)
                     session.pop("_previous_state_before_attendant", None)
-                    self._save_session(clinic_id, phone, session)
                     current_state = ConversationState.WELCOME
 
         # 2. Identify input
@@ -443,8 +499,7 @@ class ConversationEngine:
         if current_state == ConversationState.WELCOME:
             next_state = ConversationState.MAIN_MENU
         elif user_input == "back":
-            config = STATE_CONFIG.get(current_state, {})
-            previous = config.get("previous")
+            previous = STATE_CONFIG.get(current_state, _DEFAULT_STATE_CONFIG).previous
             next_state = previous if previous else ConversationState.MAIN_MENU
             # When areas were skipped, back from AVAILABLE_DAYS should go to CONFIRM_SERVICES
             if current_state == ConversationState.AVAILABLE_DAYS and session.pop("_skipped_areas", False):
@@ -545,52 +600,27 @@ class ConversationEngine:
             return ""
 
         # Global commands — recognized at any step
-        GLOBAL_BACK = {
-            "voltar", "volta", "back", "anterior", "retornar", "0",
-        }
-        GLOBAL_MENU = {
-            "menu", "menu principal", "inicio", "início",
-            "recomeçar", "recomecar", "reiniciar", "começo", "comeco",
-            "oi", "ola", "olá", "hi", "hello",
-        }
-        GLOBAL_HUMAN = {
-            "humano", "atendente", "pessoa", "ajuda", "suporte",
-            "falar com atendente", "falar com alguem", "falar com alguém",
-            "atendente humano", "falar com humano",
-        }
-
-        if text in GLOBAL_BACK:
-            logger.info(f"[ConversationEngine] _identify_input: matched 'back' from text='{text}'")
-            return "back"
-
-        if text in GLOBAL_MENU:
-            logger.info(f"[ConversationEngine] _identify_input: matched 'main_menu' from text='{text}'")
-            return "main_menu"
-
-        if text in GLOBAL_HUMAN:
-            logger.info(f"[ConversationEngine] _identify_input: matched 'human' from text='{text}'")
-            return "human"
-
-        # Synonym matching for confirm/back intents
-        CONFIRM_SYNONYMS = {"sim", "s", "ok", "confirmar", "confirmo", "pode", "isso", "certo", "bora"}
-        BACK_SYNONYMS = {"nao", "não", "n", "cancelar"}
+        command = _GLOBAL_COMMANDS.get(text)
+        if command:
+            logger.info(f"[ConversationEngine] _identify_input: matched '{command}' from text='{text}'")
+            return command
 
         current_state = ConversationState(session.get("state", ConversationState.WELCOME))
-        config = STATE_CONFIG.get(current_state, {})
-        buttons = session.get("dynamic_buttons") or config.get("buttons", [])
+        config = STATE_CONFIG.get(current_state, _DEFAULT_STATE_CONFIG)
+        buttons = session.get("dynamic_buttons") or config.buttons
 
-        if text in CONFIRM_SYNONYMS:
+        if text in _CONFIRM_SYNONYMS:
             for btn in buttons:
                 if btn["id"].startswith("confirm"):
                     logger.info(f"[ConversationEngine] _identify_input: confirm synonym '{text}' -> '{btn['id']}'")
                     return btn["id"]
 
-        if text in BACK_SYNONYMS:
+        if text in _BACK_SYNONYMS:
             logger.info(f"[ConversationEngine] _identify_input: back synonym '{text}' -> 'back'")
             return "back"
 
         # Numeric input — map to button index (skip for free_text states where numbers are data)
-        input_type = config.get("input_type")
+        input_type = config.input_type
         if text.isdigit() and input_type != "free_text":
             idx = int(text) - 1
             if 0 <= idx < len(buttons):
@@ -695,8 +725,7 @@ class ConversationEngine:
             return None
 
         # Check if transition exists in current state
-        config = STATE_CONFIG.get(current_state, {})
-        transitions = config.get("transitions", {})
+        transitions = STATE_CONFIG.get(current_state, _DEFAULT_STATE_CONFIG).transitions
 
         if transition in transitions:
             logger.info(f"[ConversationEngine] IntentClassifier: direct transition '{transition}' in state {current_state}")
@@ -740,11 +769,11 @@ class ConversationEngine:
     def _resolve_transition(
         self, current_state: ConversationState, user_input: str, session: dict
     ) -> ConversationState:
-        config = STATE_CONFIG.get(current_state, {})
-        input_type = config.get("input_type")
+        config = STATE_CONFIG.get(current_state, _DEFAULT_STATE_CONFIG)
+        input_type = config.input_type
 
         # Static transitions
-        transitions = config.get("transitions", {})
+        transitions = config.transitions
         if user_input in transitions:
             next_state = transitions[user_input]
             logger.info(f"[ConversationEngine] _resolve_transition: static '{user_input}' -> {next_state}")
@@ -770,7 +799,7 @@ class ConversationEngine:
             return next_state
 
         # Fallback
-        fallback = config.get("fallback", ConversationState.UNRECOGNIZED)
+        fallback = config.fallback
         logger.info(f"[ConversationEngine] _resolve_transition: fallback -> {fallback} (input='{user_input}', input_type={input_type})")
         return fallback
 
@@ -799,119 +828,9 @@ class ConversationEngine:
         override_content = None
 
         try:
-            if state == ConversationState.WELCOME or state == ConversationState.MAIN_MENU:
-                self._clear_flow_session_keys(session)
-                template_vars, override_content = self._on_enter_welcome(clinic_id, phone, session)
-                # Always land on MAIN_MENU so buttons are included
-                session["state"] = ConversationState.MAIN_MENU.value
-                # Store welcome intro for _build_messages to prepend as separate message
-                welcome_intro = session.pop("_welcome_intro", "")
-                if welcome_intro:
-                    session["_prepend_message"] = welcome_intro
-
-            elif state == ConversationState.PRICE_TABLE:
-                template_vars, override_content = self._on_enter_price_table(clinic_id)
-
-            elif state == ConversationState.SELECT_SERVICES:
-                template_vars, override_content, dynamic_buttons = self._on_enter_select_services(clinic_id, phone, session)
-
-            elif state == ConversationState.CONFIRM_SERVICES:
-                template_vars, override_content = self._on_enter_confirm_services(clinic_id, session)
-
-            elif state == ConversationState.SELECT_AREAS:
-                result = self._on_enter_select_areas(clinic_id, phone, session)
-                if result is None:
-                    # No areas configured — fall through to AVAILABLE_DAYS
-                    session["state"] = ConversationState.AVAILABLE_DAYS.value
-                    session["_skipped_areas"] = True
-                    template_vars, dynamic_buttons = self._on_enter_available_days(clinic_id, phone, session)
-                else:
-                    template_vars, override_content, dynamic_buttons = result
-
-            elif state == ConversationState.CONFIRM_AREAS:
-                template_vars, override_content = self._on_enter_confirm_areas(clinic_id, session)
-
-            elif state == ConversationState.AVAILABLE_DAYS:
-                template_vars, dynamic_buttons = self._on_enter_available_days(clinic_id, phone, session)
-
-            elif state == ConversationState.SELECT_TIME:
-                template_vars, dynamic_buttons = self._on_enter_select_time(clinic_id, session)
-
-            elif state == ConversationState.ASK_FULL_NAME:
-                pass  # Template ASK_FULL_NAME rendered with no variables; free-text input
-
-            elif state == ConversationState.CONFIRM_BOOKING:
-                template_vars = self._on_enter_confirm_booking(clinic_id, session)
-
-            elif state == ConversationState.BOOKED:
-                template_vars, override_content = self._on_enter_booked(clinic_id, phone, session)
-                # Pick up dynamic buttons set by _on_enter_booked (recommendations confirmation)
-                if session.get("dynamic_buttons"):
-                    dynamic_buttons = session["dynamic_buttons"]
-
-            elif state == ConversationState.RESCHEDULE_LOOKUP:
-                template_vars, dynamic_buttons, override_content = self._on_enter_reschedule_lookup(
-                    clinic_id, phone, session
-                )
-
-            elif state == ConversationState.SELECT_APPOINTMENT:
-                dynamic_buttons = session.get("dynamic_buttons")
-
-            elif state == ConversationState.SHOW_CURRENT_APPOINTMENT:
-                template_vars, dynamic_buttons = self._on_enter_show_current_appointment(
-                    clinic_id, phone, session
-                )
-
-            elif state == ConversationState.SELECT_NEW_TIME:
-                template_vars, dynamic_buttons = self._on_enter_select_new_time(clinic_id, session)
-
-            elif state == ConversationState.CONFIRM_RESCHEDULE:
-                template_vars = self._on_enter_confirm_reschedule(clinic_id, session)
-
-            elif state == ConversationState.RESCHEDULED:
-                template_vars, override_content = self._on_enter_rescheduled(clinic_id, session)
-
-            elif state == ConversationState.CANCEL_LOOKUP:
-                template_vars, dynamic_buttons, override_content = self._on_enter_cancel_lookup(
-                    clinic_id, phone, session
-                )
-
-            elif state == ConversationState.SELECT_CANCEL_APPOINTMENT:
-                dynamic_buttons = session.get("dynamic_buttons")
-
-            elif state == ConversationState.CONFIRM_CANCEL:
-                template_vars = self._on_enter_confirm_cancel(clinic_id, session)
-
-            elif state == ConversationState.CANCELLED:
-                template_vars, override_content = self._on_enter_cancelled(clinic_id, session)
-
-            elif state == ConversationState.FAQ_MENU:
-                template_vars, dynamic_buttons = self._on_enter_faq_menu(clinic_id, session)
-
-            elif state == ConversationState.FAQ_ANSWER:
-                template_vars, override_content = self._on_enter_faq_answer(clinic_id, session)
-
-            elif state == ConversationState.FAREWELL:
-                logger.info("[ConversationEngine] _on_enter: FAREWELL -> clearing flow session keys")
-                self._clear_flow_session_keys(session)
-
-            elif state == ConversationState.HUMAN_HANDOFF:
-                session["human_handoff_requested_at"] = int(time.time())
-                logger.info(f"[ConversationEngine] _on_enter: HUMAN_HANDOFF requested at {session['human_handoff_requested_at']}")
-
-            elif state == ConversationState.UNRECOGNIZED:
-                # Restore previous state's buttons + append "Menu principal"
-                prev_state_str = session.get("previousState", ConversationState.MAIN_MENU.value)
-                prev_state = ConversationState(prev_state_str)
-                prev_config = STATE_CONFIG.get(prev_state, {})
-                prev_buttons = session.get("dynamic_buttons") or prev_config.get("buttons", [])
-                buttons = list(prev_buttons) if prev_buttons else []
-                # Append "Menu principal" if not already present
-                if not any(b["id"] == "main_menu" for b in buttons):
-                    buttons.append({"id": "main_menu", "label": "Menu principal"})
-                dynamic_buttons = buttons if buttons else None
-                logger.info(f"[ConversationEngine] _on_enter: UNRECOGNIZED from prev_state={prev_state} | restoring {len(buttons)} buttons")
-
+            handler = self._ON_ENTER_HANDLERS.get(state)
+            if handler:
+                template_vars, dynamic_buttons, override_content = handler(self, clinic_id, phone, session)
         except Exception as e:
             logger.error(f"[ConversationEngine] Error in on_enter for {state}: {e}", exc_info=True)
             override_content = "Desculpe, ocorreu um erro. Tente novamente."
@@ -924,6 +843,155 @@ class ConversationEngine:
 
         return template_vars, dynamic_buttons, override_content
 
+    # --- on_enter dispatch: every entry returns (template_vars, dynamic_buttons, override_content) ---
+
+    def _enter_welcome(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        self._clear_flow_session_keys(session)
+        template_vars, override_content = self._on_enter_welcome(clinic_id, phone, session)
+        # Always land on MAIN_MENU so buttons are included
+        session["state"] = ConversationState.MAIN_MENU.value
+        # Store welcome intro for _build_messages to prepend as separate message
+        welcome_intro = session.pop("_welcome_intro", "")
+        if welcome_intro:
+            session["_prepend_message"] = welcome_intro
+        return template_vars, None, override_content
+
+    def _enter_price_table(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        template_vars, override_content = self._on_enter_price_table(clinic_id)
+        return template_vars, None, override_content
+
+    def _enter_select_services(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        template_vars, override_content, dynamic_buttons = self._on_enter_select_services(clinic_id, phone, session)
+        return template_vars, dynamic_buttons, override_content
+
+    def _enter_confirm_services(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        template_vars, override_content = self._on_enter_confirm_services(clinic_id, session)
+        return template_vars, None, override_content
+
+    def _enter_select_areas(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        result = self._on_enter_select_areas(clinic_id, phone, session)
+        if result is None:
+            # No areas configured — fall through to AVAILABLE_DAYS
+            session["state"] = ConversationState.AVAILABLE_DAYS.value
+            session["_skipped_areas"] = True
+            template_vars, dynamic_buttons = self._on_enter_available_days(clinic_id, phone, session)
+            return template_vars, dynamic_buttons, None
+        template_vars, override_content, dynamic_buttons = result
+        return template_vars, dynamic_buttons, override_content
+
+    def _enter_confirm_areas(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        template_vars, override_content = self._on_enter_confirm_areas(clinic_id, session)
+        return template_vars, None, override_content
+
+    def _enter_available_days(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        template_vars, dynamic_buttons = self._on_enter_available_days(clinic_id, phone, session)
+        return template_vars, dynamic_buttons, None
+
+    def _enter_select_time(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        template_vars, dynamic_buttons = self._on_enter_select_time(clinic_id, session)
+        return template_vars, dynamic_buttons, None
+
+    def _enter_confirm_booking(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        return self._on_enter_confirm_booking(clinic_id, session), None, None
+
+    def _enter_booked(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        template_vars, override_content = self._on_enter_booked(clinic_id, phone, session)
+        # Pick up dynamic buttons set by _on_enter_booked (recommendations confirmation)
+        return template_vars, session.get("dynamic_buttons") or None, override_content
+
+    def _enter_reschedule_lookup(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        return self._on_enter_reschedule_lookup(clinic_id, phone, session)
+
+    def _enter_show_current_appointment(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        template_vars, dynamic_buttons = self._on_enter_show_current_appointment(clinic_id, phone, session)
+        return template_vars, dynamic_buttons, None
+
+    def _enter_select_new_time(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        template_vars, dynamic_buttons = self._on_enter_select_new_time(clinic_id, session)
+        return template_vars, dynamic_buttons, None
+
+    def _enter_confirm_reschedule(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        return self._on_enter_confirm_reschedule(clinic_id, session), None, None
+
+    def _enter_rescheduled(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        template_vars, override_content = self._on_enter_rescheduled(clinic_id, session)
+        return template_vars, None, override_content
+
+    def _enter_cancel_lookup(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        return self._on_enter_cancel_lookup(clinic_id, phone, session)
+
+    def _enter_dynamic_selection(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        # Buttons were built by the lookup step that led here
+        return {}, session.get("dynamic_buttons"), None
+
+    def _enter_confirm_cancel(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        return self._on_enter_confirm_cancel(clinic_id, session), None, None
+
+    def _enter_cancelled(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        template_vars, override_content = self._on_enter_cancelled(clinic_id, session)
+        return template_vars, None, override_content
+
+    def _enter_faq_menu(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        template_vars, dynamic_buttons = self._on_enter_faq_menu(clinic_id, session)
+        return template_vars, dynamic_buttons, None
+
+    def _enter_faq_answer(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        template_vars, override_content = self._on_enter_faq_answer(clinic_id, session)
+        return template_vars, None, override_content
+
+    def _enter_farewell(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        logger.info("[ConversationEngine] _on_enter: FAREWELL -> clearing flow session keys")
+        self._clear_flow_session_keys(session)
+        return {}, None, None
+
+    def _enter_human_handoff(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        session["human_handoff_requested_at"] = int(time.time())
+        logger.info(f"[ConversationEngine] _on_enter: HUMAN_HANDOFF requested at {session['human_handoff_requested_at']}")
+        return {}, None, None
+
+    def _enter_unrecognized(self, clinic_id: str, phone: str, session: dict) -> tuple:
+        # Restore previous state's buttons + append "Menu principal"
+        prev_state_str = session.get("previousState", ConversationState.MAIN_MENU.value)
+        prev_state = ConversationState(prev_state_str)
+        prev_config = STATE_CONFIG.get(prev_state, _DEFAULT_STATE_CONFIG)
+        prev_buttons = session.get("dynamic_buttons") or prev_config.buttons
+        buttons = list(prev_buttons) if prev_buttons else []
+        # Append "Menu principal" if not already present
+        if not any(b["id"] == "main_menu" for b in buttons):
+            buttons.append({"id": "main_menu", "label": "Menu principal"})
+        logger.info(f"[ConversationEngine] _on_enter: UNRECOGNIZED from prev_state={prev_state} | restoring {len(buttons)} buttons")
+        return {}, buttons if buttons else None, None
+
+    # States without an entry (e.g. ASK_FULL_NAME) render their template with no variables
+    _ON_ENTER_HANDLERS = {
+        ConversationState.WELCOME: _enter_welcome,
+        ConversationState.MAIN_MENU: _enter_welcome,
+        ConversationState.PRICE_TABLE: _enter_price_table,
+        ConversationState.SELECT_SERVICES: _enter_select_services,
+        ConversationState.CONFIRM_SERVICES: _enter_confirm_services,
+        ConversationState.SELECT_AREAS: _enter_select_areas,
+        ConversationState.CONFIRM_AREAS: _enter_confirm_areas,
+        ConversationState.AVAILABLE_DAYS: _enter_available_days,
+        ConversationState.SELECT_TIME: _enter_select_time,
+        ConversationState.CONFIRM_BOOKING: _enter_confirm_booking,
+        ConversationState.BOOKED: _enter_booked,
+        ConversationState.RESCHEDULE_LOOKUP: _enter_reschedule_lookup,
+        ConversationState.SELECT_APPOINTMENT: _enter_dynamic_selection,
+        ConversationState.SHOW_CURRENT_APPOINTMENT: _enter_show_current_appointment,
+        ConversationState.SELECT_NEW_TIME: _enter_select_new_time,
+        ConversationState.CONFIRM_RESCHEDULE: _enter_confirm_reschedule,
+        ConversationState.RESCHEDULED: _enter_rescheduled,
+        ConversationState.CANCEL_LOOKUP: _enter_cancel_lookup,
+        ConversationState.SELECT_CANCEL_APPOINTMENT: _enter_dynamic_selection,
+        ConversationState.CONFIRM_CANCEL: _enter_confirm_cancel,
+        ConversationState.CANCELLED: _enter_cancelled,
+        ConversationState.FAQ_MENU: _enter_faq_menu,
+        ConversationState.FAQ_ANSWER: _enter_faq_answer,
+        ConversationState.FAREWELL: _enter_farewell,
+        ConversationState.HUMAN_HANDOFF: _enter_human_handoff,
+        ConversationState.UNRECOGNIZED: _enter_unrecognized,
+    }
+
     # --- on_enter handlers ---
 
     def _on_enter_welcome(self, clinic_id: str, phone: str, session: dict) -> tuple:
@@ -969,19 +1037,25 @@ class ConversationEngine:
 
     def _on_enter_price_table(self, clinic_id: str) -> tuple:
         # Fetch services with area-specific overrides
-        rows = self.db.execute_query(
-            """SELECT s.id as service_id, s.name as service_name,
-                      s.duration_minutes as service_duration, s.price_cents as service_price,
-                      a.name as area_name,
-                      COALESCE(sa.duration_minutes, s.duration_minutes) as duration,
-                      COALESCE(sa.price_cents, s.price_cents) as price
-               FROM scheduler.services s
-               LEFT JOIN scheduler.service_areas sa ON sa.service_id = s.id AND sa.active = TRUE
-               LEFT JOIN scheduler.areas a ON sa.area_id = a.id AND a.active = TRUE
-               WHERE s.clinic_id = %s AND s.active = TRUE
-               ORDER BY s.name, a.display_order, a.name""",
-            (clinic_id,),
-        )
+        now = time.monotonic()
+        cached = _price_table_cache.get(clinic_id)
+        if cached and cached[0] > now:
+            rows = cached[1]
+        else:
+            rows = self.db.execute_query(
+                """SELECT s.id as service_id, s.name as service_name,
+                          s.duration_minutes as service_duration, s.price_cents as service_price,
+                          a.name as area_name,
+                          COALESCE(sa.duration_minutes, s.duration_minutes) as duration,
+                          COALESCE(sa.price_cents, s.price_cents) as price
+                   FROM scheduler.services s
+                   LEFT JOIN scheduler.service_areas sa ON sa.service_id = s.id AND sa.active = TRUE
+                   LEFT JOIN scheduler.areas a ON sa.area_id = a.id AND a.active = TRUE
+                   WHERE s.clinic_id = %s AND s.active = TRUE
+                   ORDER BY s.name, a.display_order, a.name""",
+                (clinic_id,),
+            )
+            _price_table_cache[clinic_id] = (now + CATALOG_CACHE_TTL_SECONDS, rows)
         logger.info(f"[ConversationEngine] _on_enter_price_table: {len(rows)} rows found")
 
         # Group by service
@@ -1390,18 +1464,14 @@ class ConversationEngine:
                 service_area_pairs = session.get("selected_service_area_pairs", [])
                 svc_placeholders = ", ".join(["%s"] * len(selected_service_ids))
                 if service_area_pairs:
-                    # Build VALUES list for exact (service_id, area_id) pairs
-                    values_clause = ", ".join(["(%s::uuid, %s::uuid)"] * len(service_area_pairs))
-                    params = ()
-                    for pair in service_area_pairs:
-                        params += (pair["service_id"], pair["area_id"])
+                    # Exact (service_id, area_id) pairs, bound as two parallel arrays
                     rows = self.db.execute_query(
-                        f"""SELECT SUM(COALESCE(sa.duration_minutes, s.duration_minutes)) as total_duration,
+                        """SELECT SUM(COALESCE(sa.duration_minutes, s.duration_minutes)) as total_duration,
                                SUM(COALESCE(sa.price_cents, s.price_cents)) as total_price_cents
-                        FROM (VALUES {values_clause}) AS pairs(service_id, area_id)
+                        FROM unnest(%s::uuid[], %s::uuid[]) AS pairs(service_id, area_id)
                         JOIN scheduler.services s ON s.id = pairs.service_id AND s.active = TRUE
                         LEFT JOIN scheduler.service_areas sa ON sa.service_id = pairs.service_id AND sa.area_id = pairs.area_id AND sa.active = TRUE""",
-                        params,
+                        ([pair["service_id"] for pair in service_area_pairs], [pair["area_id"] for pair in service_area_pairs]),
                     )
                     total_duration = int(rows[0]["total_duration"]) if rows and rows[0]["total_duration"] else 0
                     total_price = int(rows[0]["total_price_cents"]) if rows and rows[0]["total_price_cents"] else 0
@@ -1447,12 +1517,12 @@ class ConversationEngine:
                 # Fallback: single service (legacy compat)
                 service_id = session.get("service_id")
                 if not service_id:
-                    svc_rows = self.db.execute_query(
+                    first_service_id = self.db.execute_scalar(
                         "SELECT id FROM scheduler.services WHERE clinic_id = %s AND active = TRUE LIMIT 1",
                         (clinic_id,),
                     )
-                    if svc_rows:
-                        service_id = str(svc_rows[0]["id"])
+                    if first_service_id:
+                        service_id = str(first_service_id)
                         session["service_id"] = service_id
                 if service_id:
                     logger.info(f"[ConversationEngine] _on_enter_available_days: single-service service_id={service_id}")
@@ -1600,19 +1670,16 @@ class ConversationEngine:
         sa_instructions = ""
         service_area_pairs = session.get("selected_service_area_pairs")
         if service_area_pairs and self.db:
-            values_clause = ", ".join(["(%s::uuid, %s::uuid)"] * len(service_area_pairs))
-            params = ()
-            for pair in service_area_pairs:
-                params += (pair["service_id"], pair["area_id"])
             rows = self.db.execute_query(
-                f"""
+                """
                 SELECT pre_session_instructions
-                FROM (VALUES {values_clause}) AS pairs(service_id, area_id)
+                FROM unnest(%s::uuid[], %s::uuid[]) WITH ORDINALITY AS pairs(service_id, area_id, ord)
                 JOIN scheduler.service_areas sa ON sa.service_id = pairs.service_id AND sa.area_id = pairs.area_id
                 WHERE sa.pre_session_instructions IS NOT NULL
                 AND sa.active = TRUE
+                ORDER BY pairs.ord
                 """,
-                params,
+                ([pair["service_id"] for pair in service_area_pairs], [pair["area_id"] for pair in service_area_pairs]),
             )
             sa_parts = [r["pre_session_instructions"] for r in rows if r.get("pre_session_instructions")]
             sa_instructions = "\n".join(sa_parts)
@@ -2004,11 +2071,12 @@ class ConversationEngine:
 
     def _on_enter_faq_menu(self, clinic_id: str, session: dict) -> tuple:
         faqs = self.db.execute_query(
-            "SELECT id, question_key, question_label FROM scheduler.faq_items WHERE clinic_id = %s AND active = TRUE ORDER BY display_order",
+            "SELECT question_key, question_label, answer FROM scheduler.faq_items WHERE clinic_id = %s AND active = TRUE ORDER BY display_order",
             (clinic_id,),
         )
         logger.info(f"[ConversationEngine] _on_enter_faq_menu: {len(faqs)} FAQ items loaded")
 
+        # Answers ride along in the session so picking a question needs no second query
         faq_items_map = {f"faq_{f['question_key']}": f for f in faqs}
 
         # If classifier provided a faq_topic, try direct match
@@ -2041,13 +2109,15 @@ class ConversationEngine:
         faq_key = selected_faq_key.replace("faq_", "") if selected_faq_key.startswith("faq_") else selected_faq_key
         logger.info(f"[ConversationEngine] _on_enter_faq_answer: selected_faq_key='{selected_faq_key}' resolved_key='{faq_key}'")
 
-        results = self.db.execute_query(
-            "SELECT answer FROM scheduler.faq_items WHERE clinic_id = %s AND question_key = %s AND active = TRUE",
-            (clinic_id, faq_key),
-        )
+        content = (session.get("faq_items") or {}).get(selected_faq_key, {}).get("answer")
+        if content is None:
+            results = self.db.execute_query(
+                "SELECT answer FROM scheduler.faq_items WHERE clinic_id = %s AND question_key = %s AND active = TRUE",
+                (clinic_id, faq_key),
+            )
+            content = results[0]["answer"] if results else None
 
-        if results:
-            content = results[0]["answer"]
+        if content is not None:
             logger.info(f"[ConversationEngine] _on_enter_faq_answer: answer found (len={len(content)})")
         else:
             content = "Desculpe, não encontramos a resposta para essa pergunta."
@@ -2094,6 +2164,7 @@ class ConversationEngine:
                     "clinicId": clinic_id,
                     "phone": phone,
                     "updatedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now)),
+                    "ttl": now + SESSION_TTL_SECONDS,
                 }
             )
         except Exception as e:
@@ -2124,20 +2195,36 @@ class ConversationEngine:
         return obj
 
     def _get_clinic(self, clinic_id: str) -> Optional[dict]:
+        now = time.monotonic()
+        cached = _clinic_cache.get(clinic_id)
+        if cached and cached[0] > now:
+            return cached[1]
+
         results = self.db.execute_query(
             "SELECT * FROM scheduler.clinics WHERE clinic_id = %s AND active = TRUE",
             (clinic_id,),
         )
-        return results[0] if results else None
+        clinic = results[0] if results else None
+        if clinic:
+            _clinic_cache[clinic_id] = (now + CATALOG_CACHE_TTL_SECONDS, clinic)
+        return clinic
 
     def _get_service(self, service_id: Optional[str]) -> Optional[dict]:
         if not service_id:
             return None
+        now = time.monotonic()
+        cached = _service_cache.get(service_id)
+        if cached and cached[0] > now:
+            return cached[1]
+
         results = self.db.execute_query(
             "SELECT * FROM scheduler.services WHERE id = %s::uuid AND active = TRUE",
             (service_id,),
         )
-        return results[0] if results else None
+        service = results[0] if results else None
+        if service:
+            _service_cache[service_id] = (now + CATALOG_CACHE_TTL_SECONDS, service)
+        return service
 
     @staticmethod
     def _format_price_brl(price_cents) -> str:
@@ -2220,7 +2307,7 @@ class ConversationEngine:
         override_content: Optional[str],
         session: dict,
     ) -> List[OutgoingMessage]:
-        config = STATE_CONFIG.get(state, {})
+        config = STATE_CONFIG.get(state, _DEFAULT_STATE_CONFIG)
         messages = []
 
         # Prepend message (e.g. welcome intro) as separate text message
@@ -2232,17 +2319,17 @@ class ConversationEngine:
         if override_content:
             content = override_content
             content_source = "override"
-        elif config.get("template_key"):
+        elif config.template_key:
             content = self.template_service.get_and_render(
-                clinic_id, config["template_key"], template_vars
+                clinic_id, config.template_key, template_vars
             )
-            content_source = f"template:{config['template_key']}"
+            content_source = f"template:{config.template_key}"
         else:
             content = ""
             content_source = "empty"
 
         # Determine buttons
-        buttons = dynamic_buttons if dynamic_buttons else config.get("buttons", [])
+        buttons = dynamic_buttons if dynamic_buttons else config.buttons
 
         logger.info(
             f"[ConversationEngine] _build_messages: state={state} | content_source={content_source} | "
@@ -2255,7 +2342,7 @@ class ConversationEngine:
                 OutgoingMessage(
                     message_type="buttons",
                     content=content,
-                    buttons=buttons,
+                    buttons=list(buttons),
                 )
             )
         else:
@@ -4,12 +4,16 @@ from contextlib import contextmanager
 from typing import Any, Dict, Generator, List, Optional
 
 import psycopg2
+from psycopg2.errors import DuplicatePreparedStatement, FeatureNotSupported, InvalidSqlStatementName
 from psycopg2.pool import SimpleConnectionPool
 from psycopg2.extras import RealDictCursor
 
 logger = logging.getLogger(__name__)
 
 _pool = None
+# Names PREPAREd on each server session (keyed by backend pid); PREPARE lasts
+# for the session, so warm invocations skip parse/plan for these statements
+_prepared_statements: Dict[int, set] = {}
 
 
 def _get_connection_pool() -> SimpleConnectionPool:
@@ -23,7 +27,15 @@ def _get_connection_pool() -> SimpleConnectionPool:
             dbname=os.environ.get("RDS_DATABASE"),
             user=os.environ.get("RDS_USERNAME"),
             password=os.environ.get("RDS_PASSWORD"),
-            options="-c search_path=scheduler,public"
+            options="-c search_path=scheduler,public",
+            application_name=os.environ.get("AWS_LAMBDA_FUNCTION_NAME", "clinic-scheduler"),
+            connect_timeout=5,
+            # The pooled connection outlives the invocation; keepalives stop a
+            # frozen container from holding a half-open socket to RDS
+            keepalives=1,
+            keepalives_idle=30,
+            keepalives_interval=10,
+            keepalives_count=3,
         )
     return _pool
 
@@ -38,15 +50,66 @@ class PostgresService:
         conn = self._pool.getconn()
         try:
             yield conn
+        except Exception:
+            # Leave the pooled connection usable for the next call instead of
+            # stuck in an aborted transaction
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    pass
+            raise
         finally:
-            self._pool.putconn(conn)
+            # A connection dropped by the server is discarded so the pool reconnects
+            self._pool.putconn(conn, close=bool(conn.closed))
 
     def execute_query(self, query: str, params: Optional[tuple] = None) -> List[Dict[str, Any]]:
         with self._get_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                 cursor.execute(query, params)
-                results = cursor.fetchall()
-                return [dict(row) for row in results]
+                # RealDictRow is already a dict subclass; no per-row copy needed
+                return cursor.fetchall()
+
+    def execute_prepared(self, name: str, query: str, params: Optional[tuple] = None) -> List[Dict[str, Any]]:
+        """Run ``query`` (with $1..$n placeholders) as the prepared statement ``name``."""
+        args = f" ({', '.join(['%s'] * len(params))})" if params else ""
+        with self._get_connection() as conn:
+            prepared = _prepared_statements.setdefault(conn.get_backend_pid(), set())
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                if name not in prepared:
+                    self._prepare(conn, cursor, name, query, prepared)
+                try:
+                    cursor.execute(f"EXECUTE {name}{args}", params or None)
+                    return cursor.fetchall()
+                except (FeatureNotSupported, InvalidSqlStatementName) as e:
+                    # "cached plan must not change result type" (the table changed
+                    # since PREPARE) or the server no longer has the statement
+                    conn.rollback()
+                    if isinstance(e, FeatureNotSupported):
+                        cursor.execute(f"DEALLOCATE {name}")
+                    prepared.discard(name)
+
+                self._prepare(conn, cursor, name, query, prepared)
+                cursor.execute(f"EXECUTE {name}{args}", params or None)
+                return cursor.fetchall()
+
+    @staticmethod
+    def _prepare(conn, cursor, name: str, query: str, prepared: set) -> None:
+        # PREPARE survives a rollback, so it is tracked as soon as it succeeds:
+        # a failing EXECUTE afterwards must not leave an untracked name behind
+        try:
+            cursor.execute(f"PREPARE {name} AS {query}")
+        except DuplicatePreparedStatement:
+            # Prepared on this session by a call that died before tracking it
+            conn.rollback()
+        prepared.add(name)
+
+    def execute_scalar(self, query: str, params: Optional[tuple] = None) -> Any:
+        with self._get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                row = cursor.fetchone()
+                return row[0] if row else None
 
     def execute_write(self, query: str, params: Optional[tuple] = None) -> int:
         with self._get_connection() as conn:
@@ -60,8 +123,7 @@ class PostgresService:
             with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                 cursor.execute(query, params)
                 conn.commit()
-                result = cursor.fetchone()
-                return dict(result) if result else None
+                return cursor.fetchone()
 
     def execute_many(self, query: str, params_list: List[tuple]) -> int:
         with self._get_connection() as conn:
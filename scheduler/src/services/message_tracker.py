@@ -11,12 +11,22 @@ from src.providers.whatsapp_provider import IncomingMessage
 
 logger = logging.getLogger(__name__)
 
+# Reused across warm invocations of the same Lambda container
+_table = None
+
+
+def _get_table():
+    global _table
+    if _table is None:
+        _table = boto3.resource("dynamodb").Table(os.environ["MESSAGE_EVENTS_TABLE"])
+    return _table
+
 
 class MessageTracker:
 
     def __init__(self):
-        dynamodb = boto3.resource("dynamodb")
-        self.table = dynamodb.Table(os.environ["MESSAGE_EVENTS_TABLE"])
+        self.table = _get_table()
+        self._pending: List[Dict[str, Any]] = []
 
     def track_outbound(
         self,
@@ -31,6 +41,57 @@ class MessageTracker:
         provider_message_id: str = "",
         provider_response: Optional[Dict[str, Any]] = None,
         metadata: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        item = self._build_outbound_item(
+            clinic_id, phone, message_id, conversation_id, message_type, content, status,
+            provider, provider_message_id, provider_response, metadata,
+        )
+
+        try:
+            self.table.put_item(Item=item)
+            logger.info(
+                f"[MessageTracker] Tracked OUTBOUND {status} | clinic={clinic_id} phone={phone} msgId={message_id}"
+            )
+        except Exception as e:
+            logger.error(f"[MessageTracker] Erro ao rastrear outbound: {e}")
+
+        return item
+
+    def track_outbound_deferred(self, **kwargs) -> Dict[str, Any]:
+        """Same arguments as track_outbound; the item is written on the next flush()."""
+        item = self._build_outbound_item(**kwargs)
+        self._pending.append(item)
+        return item
+
+    def flush(self) -> int:
+        """Writes deferred items with BatchWriteItem (batch_writer chunks by 25 and retries unprocessed)."""
+        if not self._pending:
+            return 0
+
+        pending, self._pending = self._pending, []
+        try:
+            with self.table.batch_writer(overwrite_by_pkeys=["pk", "sk"]) as batch:
+                for item in pending:
+                    batch.put_item(Item=item)
+            logger.info(f"[MessageTracker] Flushed {len(pending)} OUTBOUND item(s)")
+        except Exception as e:
+            logger.error(f"[MessageTracker] Erro ao gravar outbound em lote: {e}")
+
+        return len(pending)
+
+    def _build_outbound_item(
+        self,
+        clinic_id: str,
+        phone: str,
+        message_id: str,
+        conversation_id: str,
+        message_type: str,
+        content: str,
+        status: str,
+        provider: str = "zapi",
+        provider_message_id: str = "",
+        provider_response: Optional[Dict[str, Any]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
         now = int(time.time())
         timestamp_iso = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now))
@@ -59,14 +120,6 @@ class MessageTracker:
         if metadata:
             item["metadata"] = _sanitize_for_dynamo(metadata)
 
-        try:
-            self.table.put_item(Item=item)
-            logger.info(
-                f"[MessageTracker] Tracked OUTBOUND {status} | clinic={clinic_id} phone={phone} msgId={message_id}"
-            )
-        except Exception as e:
-            logger.error(f"[MessageTracker] Erro ao rastrear outbound: {e}")
-
         return item
 
     def track_inbound(
@@ -128,6 +181,72 @@ class MessageTracker:
         new_status: str,
         timestamp: int = 0,
         raw_payload: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        item = self._build_status_item(clinic_id, phone, message_id, new_status, timestamp)
+
+        if raw_payload:
+            item["rawPayload"] = _sanitize_for_dynamo(raw_payload)
+
+        try:
+            self.table.put_item(Item=item)
+            logger.info(
+                f"[MessageTracker] Status update {new_status} | clinic={clinic_id} phone={phone} msgId={message_id}"
+            )
+        except Exception as e:
+            logger.error(f"[MessageTracker] Erro ao atualizar status: {e}")
+
+        return item
+
+    def update_status_batch(
+        self,
+        clinic_id: str,
+        phone: str,
+        message_ids: List[str],
+        new_status: str,
+        timestamp: int = 0,
+        raw_payload: Optional[Dict[str, Any]] = None,
+        raise_errors: bool = False,
+    ) -> int:
+        """
+        Records one status callback covering several message ids with BatchWriteItem.
+        The raw payload is stored once, on the first id's item; the others point to it
+        through rawPayloadMessageId. With raise_errors the write failure propagates,
+        so a queue consumer can report the record for retry.
+        """
+        if not message_ids:
+            return 0
+
+        items = [
+            self._build_status_item(clinic_id, phone, message_id, new_status, timestamp)
+            for message_id in message_ids
+        ]
+        if raw_payload:
+            items[0]["rawPayload"] = _sanitize_for_dynamo(raw_payload)
+            for item in items[1:]:
+                item["rawPayloadMessageId"] = message_ids[0]
+
+        try:
+            with self.table.batch_writer(overwrite_by_pkeys=["pk", "sk"]) as batch:
+                for item in items:
+                    batch.put_item(Item=item)
+            logger.info(
+                f"[MessageTracker] Status update {new_status} | clinic={clinic_id} phone={phone} count={len(items)}"
+            )
+        except Exception as e:
+            logger.error(f"[MessageTracker] Erro ao atualizar status em lote: {e}")
+            if raise_errors:
+                raise
+            return 0
+
+        return len(items)
+
+    def _build_status_item(
+        self,
+        clinic_id: str,
+        phone: str,
+        message_id: str,
+        new_status: str,
+        timestamp: int = 0,
     ) -> Dict[str, Any]:
         now = int(time.time())
         event_time = timestamp if timestamp else now
@@ -136,7 +255,7 @@ class MessageTracker:
             event_time = event_time // 1000
         timestamp_iso = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(event_time))
 
-        item = {
+        return {
             "pk": f"CLINIC#{clinic_id}#PHONE#{phone}",
             "sk": f"STATUS#{timestamp_iso}#{message_id}#{new_status}",
             "clinicId": clinic_id,
@@ -150,19 +269,6 @@ class MessageTracker:
             "updatedAt": timestamp_iso,
         }
 
-        if raw_payload:
-            item["rawPayload"] = _sanitize_for_dynamo(raw_payload)
-
-        try:
-            self.table.put_item(Item=item)
-            logger.info(
-                f"[MessageTracker] Status update {new_status} | clinic={clinic_id} phone={phone} msgId={message_id}"
-            )
-        except Exception as e:
-            logger.error(f"[MessageTracker] Erro ao atualizar status: {e}")
-
-        return item
-
     def get_conversation_messages(
         self, clinic_id: str, phone: str, limit: int = 50
     ) -> List[Dict[str, Any]]:
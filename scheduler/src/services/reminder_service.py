@@ -10,12 +10,21 @@ from boto3.dynamodb.conditions import Key, Attr
 
 logger = logging.getLogger(__name__)
 
+# Reused across warm invocations of the same Lambda container
+_table = None
+
+
+def _get_table():
+    global _table
+    if _table is None:
+        _table = boto3.resource("dynamodb").Table(os.environ["SCHEDULED_REMINDERS_TABLE"])
+    return _table
+
 
 class ReminderService:
 
     def __init__(self):
-        dynamodb = boto3.resource("dynamodb")
-        self.table = dynamodb.Table(os.environ["SCHEDULED_REMINDERS_TABLE"])
+        self.table = _get_table()
 
     def schedule_reminder(self, appointment: Dict[str, Any]) -> Dict[str, Any]:
         reminder_id = str(uuid.uuid4())
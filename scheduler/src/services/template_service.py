@@ -1,11 +1,19 @@
 import re
 import logging
+from time import monotonic
 from typing import Any, Dict, Optional
 
 from src.services.db.postgres import PostgresService
 
 logger = logging.getLogger(__name__)
 
+TEMPLATE_CACHE_TTL_SECONDS = 300
+
+_TEMPLATE_VAR_RE = re.compile(r"\{\{(\w+)\}\}")
+
+# Reused across warm invocations: (expires_at, template) per (clinic_id, template_key)
+_template_cache: Dict[tuple, tuple] = {}
+
 DEFAULT_TEMPLATES = {
     "WELCOME_NEW": "Olá! Seja {{bem_vindx}} à *{{clinic_name}}*!\n\nComo posso te ajudar hoje?",
     "WELCOME_RETURNING": "Olá, {{patient_name}}! {{Bem_vindx}} de volta à *{{clinic_name}}*!\n\nComo posso te ajudar?",
@@ -142,6 +150,12 @@ class TemplateService:
         self.db = db
 
     def get_template(self, clinic_id: str, template_key: str) -> Dict[str, Any]:
+        cache_key = (clinic_id, template_key)
+        now = monotonic()
+        cached = _template_cache.get(cache_key)
+        if cached and cached[0] > now:
+            return cached[1]
+
         try:
             results = self.db.execute_query(
                 """
@@ -152,8 +166,13 @@ class TemplateService:
                 (clinic_id, template_key),
             )
             logger.info(f"[TemplateService] get_template results: {results}")
-            if results:
-                return results[0]
+            template = results[0] if results else {
+                "template_key": template_key,
+                "content": DEFAULT_TEMPLATES.get(template_key, ""),
+                "buttons": None,
+            }
+            _template_cache[cache_key] = (now + TEMPLATE_CACHE_TTL_SECONDS, template)
+            return template
         except Exception as e:
             logger.warning(f"[TemplateService] Erro ao buscar template {template_key}: {e}")
 
@@ -173,7 +192,7 @@ class TemplateService:
                 return ""
             return str(value)
 
-        return re.sub(r"\{\{(\w+)\}\}", replace_var, content)
+        return _TEMPLATE_VAR_RE.sub(replace_var, content)
 
     def get_and_render(self, clinic_id: str, template_key: str, variables: Optional[Dict[str, str]] = None) -> str:
         template = self.get_template(clinic_id, template_key)
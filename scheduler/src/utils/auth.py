@@ -1,6 +1,7 @@
 import os
 import logging
 import hashlib
+import hmac
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -14,7 +15,7 @@ class SchedulerAuth:
             if not expected_api_key:
                 logger.error("SCHEDULER_API_KEY não configurada no ambiente")
                 return False
-            return expected_api_key == api_key
+            return hmac.compare_digest(expected_api_key.encode(), str(api_key or "").encode())
         except Exception as e:
             logger.error(f"Erro ao validar API key: {str(e)}")
             return False
@@ -1,5 +1,11 @@
+import base64
+import binascii
 import json
+from datetime import date, datetime, time
+from decimal import Decimal
 from typing import Dict, Any, Optional, Tuple
+from uuid import UUID
+
 from src.utils.auth import SchedulerAuth
 from src.utils.decimal_utils import convert_decimal_to_json_serializable
 
@@ -56,14 +62,16 @@ def parse_body(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     if "body" not in event or not event["body"]:
         return None
 
+    raw = event["body"]
     try:
-        if isinstance(event["body"], str):
-            return json.loads(event["body"])
-        elif isinstance(event["body"], dict):
-            return event["body"]
-        else:
+        if isinstance(raw, dict):
+            return raw
+        if not isinstance(raw, str):
             return None
-    except (json.JSONDecodeError, TypeError):
+        if event.get("isBase64Encoded"):
+            return json.loads(base64.b64decode(raw))
+        return json.loads(raw)
+    except (json.JSONDecodeError, binascii.Error, TypeError):
         return None
 
 
@@ -91,8 +99,8 @@ def http_response(status_code: int, body: Any, headers: Optional[Dict[str, str]]
         default_headers.update(headers)
 
     if isinstance(body, dict):
-        body_serializable = convert_decimal_to_json_serializable(body)
-        body_str = json.dumps(body_serializable)
+        # DB rows go straight through: the default hook converts only the cells that need it
+        body_str = json.dumps(body, default=_json_default)
     elif isinstance(body, str):
         body_str = json.dumps({"message": body})
     else:
@@ -106,6 +114,16 @@ def http_response(status_code: int, body: Any, headers: Optional[Dict[str, str]]
     }
 
 
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"Tipo não serializável em JSON: {type(value).__name__}")
+
+
 def require_api_key(event: Dict[str, Any], body: Optional[Dict[str, Any]] = None) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
     api_key = extract_api_key(event, body)
     is_valid, error_message = validate_api_key(api_key)
@@ -0,0 +1,155 @@
+"""Unit tests for AvailabilityEngine slot computation (range load, windows, buffers)."""
+
+import unittest
+from datetime import date, timedelta
+from unittest.mock import MagicMock
+
+from src.services import availability_engine
+from src.services.availability_engine import (
+    AvailabilityEngine,
+    _merge_intervals,
+    _minutes_to_time_str,
+)
+
+BUFFER = 10
+DURATION = 50  # with the buffer, slots start every hour
+
+MONDAY = date(2024, 6, 3)
+SUNDAY = date(2024, 6, 2)
+
+
+def _m(hhmm):
+    h, m = hhmm.split(":")
+    return int(h) * 60 + int(m)
+
+
+def _rule(start, end, day_of_week=None, day=None):
+    return {"kind": "rule", "day": day, "day_of_week": day_of_week, "exception_type": None,
+            "start_minute": _m(start), "end_minute": _m(end)}
+
+
+def _exception(day, exception_type, start="00:00", end="00:00"):
+    return {"kind": "exception", "day": day, "day_of_week": None, "exception_type": exception_type,
+            "start_minute": _m(start), "end_minute": _m(end)}
+
+
+def _appointment(day, start, end):
+    return {"kind": "appointment", "day": day, "day_of_week": None, "exception_type": None,
+            "start_minute": _m(start), "end_minute": _m(end)}
+
+
+# Weekly schedule: Sunday 10:00-12:00 and Monday 09:00-12:00, nothing else
+WEEKLY_RULES = [
+    _rule("10:00", "12:00", day_of_week=0),
+    _rule("09:00", "12:00", day_of_week=1),
+]
+
+
+class _EngineTestCase(unittest.TestCase):
+
+    def setUp(self):
+        availability_engine._service_duration_cache.clear()
+        availability_engine._clinic_config_cache.clear()
+        self.db = MagicMock()
+        self.db.execute_query.return_value = [{"buffer_minutes": BUFFER, "max_future_dates": 5, "active": True}]
+        self.db.execute_prepared.return_value = list(WEEKLY_RULES)
+        self.engine = AvailabilityEngine(self.db)
+
+    def tearDown(self):
+        availability_engine._service_duration_cache.clear()
+        availability_engine._clinic_config_cache.clear()
+
+    def _slots(self, day, extra_rows=()):
+        self.db.execute_prepared.return_value = list(WEEKLY_RULES) + list(extra_rows)
+        _, slots = next(self.engine._iter_day_slots("clinic-1", day, day, DURATION))
+        return [_minutes_to_time_str(s) for s in slots]
+
+
+class TestDaySlots(_EngineTestCase):
+    """Slots for a single day, from the rows of the range query."""
+
+    def test_weekly_rule(self):
+        self.assertEqual(self._slots(MONDAY), ["09:00", "10:00", "11:00"])
+
+    def test_sunday_uses_day_of_week_zero(self):
+        self.assertEqual(self._slots(SUNDAY), ["10:00", "11:00"])
+
+    def test_day_without_rule_is_closed(self):
+        self.assertEqual(self._slots(date(2024, 6, 8)), [])  # Saturday
+
+    def test_fixed_date_rule_replaces_weekly_rule(self):
+        day = date(2024, 6, 10)
+        self.assertEqual(self._slots(day, [_rule("14:00", "16:00", day=day)]), ["14:00", "15:00"])
+
+    def test_fixed_date_rule_does_not_leak_to_other_days(self):
+        other = date(2024, 6, 10)
+        self.assertEqual(self._slots(MONDAY, [_rule("14:00", "16:00", day=other)]), ["09:00", "10:00", "11:00"])
+
+    def test_blocked_day_has_no_slots(self):
+        day = date(2024, 6, 17)
+        self.assertEqual(self._slots(day, [_exception(day, "BLOCKED")]), [])
+
+    def test_special_hours_replace_rule_windows(self):
+        day = date(2024, 6, 24)
+        rows = [_exception(day, "SPECIAL_HOURS", "13:00", "14:00")]
+        self.assertEqual(self._slots(day, rows), ["13:00"])
+
+    def test_every_special_hours_exception_applies(self):
+        day = date(2024, 6, 24)
+        rows = [
+            _exception(day, "SPECIAL_HOURS", "13:00", "14:00"),
+            _exception(day, "SPECIAL_HOURS", "08:00", "09:00"),
+        ]
+        self.assertEqual(self._slots(day, rows), ["08:00", "13:00"])
+
+    def test_back_to_back_appointments_block_with_buffer(self):
+        day = date(2024, 7, 1)
+        rows = [
+            _appointment(day, "09:00", "09:50"),
+            _appointment(day, "09:50", "10:40"),
+        ]
+        # Blocked 08:50-10:50 once the buffer is applied on both sides
+        self.assertEqual(self._slots(day, rows), ["10:50"])
+
+    def test_appointment_on_other_day_is_ignored(self):
+        rows = [_appointment(MONDAY + timedelta(days=7), "09:00", "12:00")]
+        self.assertEqual(self._slots(MONDAY, rows), ["09:00", "10:00", "11:00"])
+
+
+class TestRangeIteration(_EngineTestCase):
+
+    def test_week_maps_ordinals_to_day_of_week(self):
+        self.db.execute_prepared.return_value = list(WEEKLY_RULES)
+        days = self.engine._iter_day_slots("clinic-1", SUNDAY, SUNDAY + timedelta(days=6), DURATION)
+        open_days = [day for day, slots in days if slots]
+        self.assertEqual(open_days, [SUNDAY, MONDAY])
+
+    def test_range_is_loaded_once(self):
+        days = list(self.engine._iter_day_slots("clinic-1", SUNDAY, SUNDAY + timedelta(days=13), DURATION))
+        self.assertEqual(len(days), 14)
+        self.db.execute_prepared.assert_called_once()
+
+
+class TestIntervalHelpers(unittest.TestCase):
+
+    def test_merge_sorts_and_joins_overlapping_and_touching(self):
+        self.assertEqual(
+            _merge_intervals([(600, 660), (530, 600), (700, 720), (710, 715)]),
+            [(530, 660), (700, 720)],
+        )
+
+    def test_free_windows_subtract_blocks(self):
+        free = AvailabilityEngine._calculate_free_windows([(540, 720)], [(500, 560), (600, 630), (700, 800)])
+        self.assertEqual(free, [(560, 600), (630, 700)])
+
+    def test_free_windows_skip_blocks_before_window(self):
+        free = AvailabilityEngine._calculate_free_windows([(540, 600), (840, 960)], [(550, 560), (900, 910)])
+        self.assertEqual(free, [(540, 550), (560, 600), (840, 900), (910, 960)])
+
+    def test_slots_step_by_duration_plus_buffer_and_fit_in_window(self):
+        slots = AvailabilityEngine._generate_slots_in_windows([(540, 720), (800, 840)], 50, 10)
+        self.assertEqual(slots, [540, 600, 660])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+"""Unit tests for PostgresService.execute_prepared against a fake server session."""
+
+import unittest
+from unittest.mock import patch
+
+from psycopg2.errors import (
+    DuplicatePreparedStatement,
+    FeatureNotSupported,
+    InvalidSqlStatementName,
+    InvalidTextRepresentation,
+)
+
+from src.services.db import postgres
+from src.services.db.postgres import PostgresService
+
+
+class _FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.conn.statements.append(sql)
+        verb, name = sql.split()[:2]
+        server = self.conn.server_prepared
+        if verb == "PREPARE":
+            if name in server:
+                raise DuplicatePreparedStatement(f'prepared statement "{name}" already exists')
+            server.add(name)
+        elif verb == "DEALLOCATE":
+            server.discard(name)
+        elif verb == "EXECUTE":
+            if name not in server:
+                raise InvalidSqlStatementName(f'prepared statement "{name}" does not exist')
+            if self.conn.execute_errors:
+                raise self.conn.execute_errors.pop(0)
+            self._rows = [{"id": params[0]}] if params else []
+
+    def fetchall(self):
+        return self._rows
+
+
+class _FakeConnection:
+    closed = False
+
+    def __init__(self):
+        # PREPARE is session state: it survives rollback, like on the server
+        self.server_prepared = set()
+        self.execute_errors = []
+        self.statements = []
+        self.rollbacks = 0
+
+    def get_backend_pid(self):
+        return 4242
+
+    def cursor(self, cursor_factory=None):
+        return _FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class _FakePool:
+    closed = False
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def getconn(self):
+        return self.conn
+
+    def putconn(self, conn, close=False):
+        pass
+
+
+class TestExecutePrepared(unittest.TestCase):
+
+    def setUp(self):
+        postgres._prepared_statements.clear()
+        self.conn = _FakeConnection()
+        with patch.object(postgres, "_get_connection_pool", return_value=_FakePool(self.conn)):
+            self.db = PostgresService()
+
+    def tearDown(self):
+        postgres._prepared_statements.clear()
+
+    def _run(self, value="a"):
+        return self.db.execute_prepared("q_test", "SELECT $1::uuid AS id", (value,))
+
+    def test_prepares_once_then_only_executes(self):
+        self.assertEqual(self._run(), [{"id": "a"}])
+        self.assertEqual(self._run("b"), [{"id": "b"}])
+        verbs = [sql.split()[0] for sql in self.conn.statements]
+        self.assertEqual(verbs, ["PREPARE", "EXECUTE", "EXECUTE"])
+
+    def test_failed_first_execute_keeps_statement_tracked(self):
+        self.conn.execute_errors.append(InvalidTextRepresentation("invalid input syntax for type uuid"))
+
+        with self.assertRaises(InvalidTextRepresentation):
+            self._run("not-a-uuid")
+
+        self.assertIn("q_test", postgres._prepared_statements[4242])
+        self.assertEqual(self._run(), [{"id": "a"}])
+        verbs = [sql.split()[0] for sql in self.conn.statements]
+        self.assertEqual(verbs, ["PREPARE", "EXECUTE", "EXECUTE"])
+
+    def test_untracked_statement_on_server_is_adopted(self):
+        self.conn.server_prepared.add("q_test")
+
+        self.assertEqual(self._run(), [{"id": "a"}])
+        self.assertIn("q_test", postgres._prepared_statements[4242])
+        self.assertEqual(self.conn.rollbacks, 1)
+
+    def test_statement_dropped_by_server_is_prepared_again(self):
+        postgres._prepared_statements[4242] = {"q_test"}
+
+        self.assertEqual(self._run(), [{"id": "a"}])
+        verbs = [sql.split()[0] for sql in self.conn.statements]
+        self.assertEqual(verbs, ["EXECUTE", "PREPARE", "EXECUTE"])
+
+    def test_changed_result_type_deallocates_and_prepares_again(self):
+        self._run()
+        self.conn.execute_errors.append(FeatureNotSupported("cached plan must not change result type"))
+
+        self.assertEqual(self._run("b"), [{"id": "b"}])
+        verbs = [sql.split()[0] for sql in self.conn.statements]
+        self.assertEqual(verbs, ["PREPARE", "EXECUTE", "EXECUTE", "DEALLOCATE", "PREPARE", "EXECUTE"])
+
+
+if __name__ == "__main__":
+    unittest.main()
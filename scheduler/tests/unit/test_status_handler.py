@@ -0,0 +1,63 @@
+"""Unit tests for the status-updates SQS consumer."""
+
+import json
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+os.environ.setdefault("MESSAGE_EVENTS_TABLE", "test-message-events")
+
+from src.functions.webhook import status_handler
+
+
+def _record(message_id, body):
+    return {"messageId": message_id, "body": json.dumps(body)}
+
+
+STATUS_BODY = {
+    "instanceId": "instance-1",
+    "status": "READ",
+    "ids": ["msg-1", "msg-2"],
+    "phone": "5511999990000",
+    "momment": 1700000000000,
+}
+
+
+class TestProcessQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.table = MagicMock()
+        patches = [
+            patch("src.services.message_tracker._get_table", return_value=self.table),
+            patch.object(status_handler, "_resolve_clinic_id", return_value="clinic-1"),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_recorded_status_reports_no_failures(self):
+        result = status_handler.process_queue({"Records": [_record("rec-1", STATUS_BODY)]}, None)
+
+        self.assertEqual(result, {"batchItemFailures": []})
+        batch = self.table.batch_writer.return_value.__enter__.return_value
+        self.assertEqual(batch.put_item.call_count, 2)
+
+    def test_failed_write_is_reported_for_retry(self):
+        self.table.batch_writer.return_value.__exit__.side_effect = Exception("ProvisionedThroughputExceeded")
+
+        result = status_handler.process_queue({
+            "Records": [_record("rec-1", STATUS_BODY)],
+        }, None)
+
+        self.assertEqual(result, {"batchItemFailures": [{"itemIdentifier": "rec-1"}]})
+
+    def test_unknown_clinic_is_not_retried(self):
+        with patch.object(status_handler, "_resolve_clinic_id", return_value=None):
+            result = status_handler.process_queue({"Records": [_record("rec-1", STATUS_BODY)]}, None)
+
+        self.assertEqual(result, {"batchItemFailures": []})
+        self.table.batch_writer.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()